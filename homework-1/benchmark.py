@@ -0,0 +1,662 @@
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_file(name: str, filename: str):
+    """Import a module of this folder by path. stat.py shares its name with the
+    standard library module that is already imported by the interpreter"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+aqi_stat = import_file("aqi_stat", "stat.py")
+aqi_load = import_file("aqi_load", "load.py")
+aqi_search = import_file("aqi_search", "search.py")
+
+
+class FirebaseStandIn(ThreadingHTTPServer):
+    """Local, in-memory stand-in for the parts of the Firebase Realtime DB REST API
+    used by homework-1: GET with orderBy/startAt/endAt and shallow, ETags, event
+    streams, PUT, multi-path PATCH and DELETE"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), FirebaseHandler)
+        self.tree = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        # Simulated network round trip, in seconds
+        self.latency = 0
+        # Number of PATCH requests accepted before the next ones fail, None for all
+        self.writes_allowed = None
+        # (keys, queue) of every open event stream
+        self.listeners = []
+        self.keep_alive = 30
+
+    @property
+    def base_uri(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            for _, events in self.listeners:
+                events.put(None)
+        self.shutdown()
+        self.server_close()
+
+    def get_node(self, keys: list):
+        node = self.tree
+        for key in keys:
+            if type(node) is not dict or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def set_node(self, keys: list, value):
+        if not keys:
+            self.tree = value if type(value) is dict else {}
+            return
+        node = self.tree
+        for key in keys[:-1]:
+            if type(node.get(key)) is not dict:
+                node[key] = {}
+            node = node[key]
+        if value is None:
+            node.pop(keys[-1], None)
+        else:
+            node[keys[-1]] = value
+
+    def publish(self, keys: list, event: str, data):
+        """Queue the event of a write for the streams at, above or below its location.
+        Called with the lock held so that the events keep the order of the writes"""
+        for listener, events in self.listeners:
+            if keys[: len(listener)] == listener:
+                path = "/" + "/".join(keys[len(listener) :])
+                events.put((event, json.dumps({"path": path, "data": data})))
+            elif listener[: len(keys)] == keys:
+                node = self.get_node(listener)
+                events.put(("put", json.dumps({"path": "/", "data": node})))
+
+
+def apply_query(value, query: dict):
+    """Apply the Firebase REST shallow and orderBy child range parameters to a node"""
+    if type(value) is not dict:
+        return value
+    if query.get("shallow") == "true":
+        return {k: True if type(child) is dict else child for k, child in value.items()}
+    if "orderBy" not in query:
+        return value
+    order_by = json.loads(query["orderBy"])
+    start = json.loads(query.get("startAt", "null"))
+    end = json.loads(query.get("endAt", "null"))
+    res = {}
+    for key, child in value.items():
+        field = child.get(order_by) if type(child) is dict else None
+        if type(field) not in (int, float):
+            continue
+        if (start is None or field >= start) and (end is None or field <= end):
+            res[key] = child
+    return res
+
+
+class FirebaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one_request(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        super().handle_one_request()
+
+    def _keys(self) -> list:
+        path = urlsplit(self.path).path
+        assert path.endswith(".json"), "Path must end with .json"
+        return [unquote(key) for key in path[: -len(".json")].split("/") if key]
+
+    def _query(self) -> dict:
+        query = parse_qs(urlsplit(self.path).query)
+        return {key: values[-1] for key, values in query.items()}
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        with self.server.lock:
+            self.server.bytes_received += length
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send(self, body: bytes, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+            self.server.requests += 1
+        self.wfile.write(body)
+
+    def _stream(self):
+        """Firebase REST streaming: a put event with the whole node, then an event
+        per write, over a chunked text/event-stream response"""
+        keys, events = self._keys(), queue.Queue()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with self.server.lock:
+            self.server.listeners.append((keys, events))
+            data = self.server.get_node(keys)
+            events.put(("put", json.dumps({"path": "/", "data": data})))
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=self.server.keep_alive)
+                except queue.Empty:
+                    item = ("keep-alive", "null")
+                if item is None:
+                    break
+                chunk = ("event: %s\ndata: %s\n\n" % item).encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with self.server.lock:
+                self.server.listeners.remove((keys, events))
+            self.close_connection = True
+
+    def do_GET(self):
+        if "text/event-stream" in self.headers.get("Accept", ""):
+            self._stream()
+            return
+        with self.server.lock:
+            value = apply_query(self.server.get_node(self._keys()), self._query())
+            body = json.dumps(value, sort_keys=True).encode()
+        headers = {}
+        # Like Firebase, If-None-Match is ignored and the body is always sent
+        if self.headers.get("X-Firebase-ETag") == "true":
+            headers["ETag"] = hashlib.md5(body).hexdigest()
+        self._send(body, headers=headers)
+
+    def do_PUT(self):
+        value = self._body()
+        with self.server.lock:
+            self.server.set_node(self._keys(), value)
+            self.server.publish(self._keys(), "put", value)
+        self._send(json.dumps(value).encode())
+
+    def do_PATCH(self):
+        data = self._body()
+        keys = self._keys()
+        with self.server.lock:
+            failing = self.server.writes_allowed is not None
+            if failing and self.server.writes_allowed > 0:
+                self.server.writes_allowed -= 1
+                failing = False
+        if failing:
+            self._send(b'{"error": "unavailable"}', 503)
+            return
+        with self.server.lock:
+            for path, value in data.items():
+                self.server.set_node(keys + [k for k in path.split("/") if k], value)
+            self.server.publish(keys, "patch", data)
+        if self._query().get("print") == "silent":
+            self._send(b"", 204)
+            return
+        self._send(json.dumps(data).encode())
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.set_node(self._keys(), None)
+            self.server.publish(self._keys(), "put", None)
+        self._send(b"null")
+
+
+def make_aqi_csv(path: str, copies: int, source: str = "data/aqi.csv", start: int = 0):
+    """Writes data/aqi.csv again and again, each copy shifted by a year so that the
+    rows and the groups stay distinct, duplicates included. Copies from start on are
+    appended to the file"""
+    df = pd.read_csv(os.path.join(HERE, source), dtype=str)
+    year, rest = df["Date"].str[:4].astype(int), df["Date"].str[4:]
+    with open(path, "a" if start else "w") as f:
+        for copy in range(start, start + copies):
+            df.assign(Date=(year + copy).astype(str) + rest).to_csv(
+                f, header=copy == 0, index=False
+            )
+
+
+def peak_rss() -> float:
+    """Peak RSS of this process in MiB. VmHWM starts over at exec, unlike ru_maxrss
+    which a spawned process inherits from its parent."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_peak_rss(function: str, *args) -> tuple:
+    """Run a stat.py function and report its result, time and the peak RSS of this
+    process. Runs in a fresh process so the peaks do not mix"""
+    start = time.perf_counter()
+    df = getattr(aqi_stat, function)(*args)
+    return df, time.perf_counter() - start, peak_rss()
+
+
+def bench_chunked(copies: tuple = (10, 100, 300), chunk_size: int = 10**5):
+    """Throughput and peak memory of the in-memory and the chunked aggregation"""
+    print(f"[stat] in-memory vs chunked aggregation, {chunk_size:,} rows per chunk")
+    context = multiprocessing.get_context("spawn")
+    for count in copies:
+        path = os.path.join(tempfile.mkdtemp(), "aqi.csv")
+        make_aqi_csv(path, count)
+        with open(path) as f:
+            rows = sum(1 for _ in f) - 1
+        results = {}
+        for function, args in (
+            ("get_avg_aqi", (path,)),
+            ("get_avg_aqi_chunked", (path, chunk_size)),
+        ):
+            with context.Pool(1) as pool:
+                results[function] = pool.apply(run_peak_rss, (function, *args))
+        pd.testing.assert_frame_equal(
+            results["get_avg_aqi"][0], results["get_avg_aqi_chunked"][0]
+        )
+        print(
+            f"\t{os.path.getsize(path) / 2**20:6.1f} MiB, {rows:>10,} rows : "
+            + ", ".join(
+                f"{name} {rows / elapsed:>9,.0f} rows/s {rss:6.1f} MiB peak"
+                for name, (_, elapsed, rss) in (
+                    ("in-memory", results["get_avg_aqi"]),
+                    ("chunked", results["get_avg_aqi_chunked"]),
+                )
+            )
+        )
+        os.remove(path)
+
+
+def bench_parallel(copies: int = 100, workers: tuple = None):
+    """Scaling of the byte range map/combine/reduce aggregation with the number of
+    worker processes"""
+    workers = workers or sorted({1, 2, 4, os.cpu_count() or 1})
+    path = os.path.join(tempfile.mkdtemp(), "aqi.csv")
+    make_aqi_csv(path, copies)
+    with open(path) as f:
+        rows = sum(1 for _ in f) - 1
+    print(f"[stat] parallel aggregation, {rows:,} rows, {os.cpu_count()} CPUs")
+    expected = aqi_stat.get_avg_aqi_chunked(path)
+    baseline = None
+    for count in workers:
+        start = time.perf_counter()
+        df = aqi_stat.get_avg_aqi_parallel(path, count)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(expected, df)
+        baseline = baseline or elapsed
+        print(
+            f"\t{count:>3} workers : {elapsed:6.2f}s, {rows / elapsed:>10,.0f} rows/s, "
+            f"{baseline / elapsed:4.1f}x"
+        )
+    os.remove(path)
+
+
+def bench_incremental(history: tuple = (10, 100, 300)):
+    """Time to take one more copy of data/aqi.csv into the aggregates, recomputed
+    from the whole file against updated from the persisted state"""
+    print("[stat] full recompute vs incremental update after appending 10,129 rows")
+    for copies in history:
+        folder = tempfile.mkdtemp()
+        path, state = os.path.join(folder, "aqi.csv"), os.path.join(folder, "aqi.state")
+        make_aqi_csv(path, copies)
+        with contextlib.redirect_stdout(io.StringIO()):
+            aqi_stat.get_avg_aqi_incremental(path, state)
+        make_aqi_csv(path, 1, start=copies)
+        start = time.perf_counter()
+        full = aqi_stat.get_avg_aqi_chunked(path)
+        full_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        df = aqi_stat.get_avg_aqi_incremental(path, state)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(full, df)
+        print(
+            f"\t{os.path.getsize(path) / 2**20:6.1f} MiB history : full "
+            f"{full_elapsed:6.3f}s, incremental {elapsed:6.3f}s, state "
+            f"{os.path.getsize(state) / 1024:7.1f} KiB"
+        )
+        os.remove(path)
+
+
+def bench_handoff(copies: int = 300, repeat: int = 3):
+    """stat.py to load.py handoff through a JSON file and through an Arrow file"""
+    path = os.path.join(tempfile.mkdtemp(), "aqi.csv")
+    make_aqi_csv(path, copies)
+    df = aqi_stat.get_avg_aqi_chunked(path)
+    os.remove(path)
+    print(f"[handoff] stat.py -> load.py, {len(df):,} records")
+    docs = {}
+    for name, save, extension in (
+        ("json", aqi_stat.save_as_json, ".json"),
+        ("arrow", aqi_stat.save_as_arrow, ".arrow"),
+    ):
+        path = os.path.join(tempfile.mkdtemp(), "aqi" + extension)
+        timings = {"write": [], "read": []}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                save(df, path)
+            timings["write"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            docs[name] = aqi_load.read_data(path)
+            timings["read"].append(time.perf_counter() - start)
+        print(
+            f"\t{name:<5} : {os.path.getsize(path) / 2**20:6.2f} MiB, "
+            f"write {min(timings['write']) * 1000:7.1f} ms, "
+            f"read + keys {min(timings['read']) * 1000:7.1f} ms"
+        )
+        os.remove(path)
+    assert docs["json"] == docs["arrow"]
+
+
+def make_aqi_doc(copies: int) -> dict:
+    """The aqi node as load.py uploads it, for data/aqi.json repeated with the years
+    shifted"""
+    with open(os.path.join(HERE, "data/aqi.json")) as f:
+        records = json.load(f)
+    records = [dict(r, Year=r["Year"] + i) for i in range(copies) for r in records]
+    return {
+        f"{r['Country'].lower().replace(' ', '_')}{r['Year']}{r['Month']}": r
+        for r in records
+    }
+
+
+def bench_search(
+    server: FirebaseStandIn, copies: int = 20, queries: int = 200, latency: float = 0.01
+):
+    """Range query latency through Firebase and through the local sorted index"""
+    url = f"{server.base_uri}/aqi.json"
+    doc = make_aqi_doc(copies)
+    requests_session = aqi_search.requests.Session()
+    requests_session.put(url, json.dumps(doc))
+    print(
+        f"[search] {len(doc):,} records, {queries} range queries, "
+        f"{latency * 1000:.0f} ms simulated round trip"
+    )
+    rng = random.Random(0)
+    ranges = []
+    for _ in range(queries):
+        low = rng.randint(0, 150)
+        ranges.append((str(low), str(low + rng.randint(0, 20))))
+    server.latency = latency
+    index = aqi_search.AQIIndex(url)
+    start = time.perf_counter()
+    index.refresh()
+    build = time.perf_counter() - start
+    timings = {"remote": [], "local": []}
+    for range_min, range_max in ranges[:20]:
+        start = time.perf_counter()
+        remote = aqi_search.search(url, range_min, range_max)
+        remote = aqi_search.restucture_data(remote)
+        timings["remote"].append(time.perf_counter() - start)
+        local = index.search(range_min, range_max)
+        pd.testing.assert_frame_equal(remote, local)
+    for range_min, range_max in ranges:
+        start = time.perf_counter()
+        index.search(range_min, range_max)
+        timings["local"].append(time.perf_counter() - start)
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        print(
+            f"\t{name:<6} : p50 {np.percentile(values, 50):8.3f} ms, "
+            f"p99 {np.percentile(values, 99):8.3f} ms"
+        )
+    print(f"\tsnapshot build : {build * 1000:.1f} ms")
+
+    # Every check downloads the node, an unchanged ETag only skips the rebuild
+    for label, change in (("unchanged", None), ("changed", 1.0)):
+        if change:
+            key = next(iter(doc))
+            requests_session.patch(url, json.dumps({f"{key}/Avg AQI": change}))
+        start = time.perf_counter()
+        rebuilt = index.refresh()
+        elapsed = time.perf_counter() - start
+        print(f"\tETag check, {label:<9} : {elapsed * 1000:6.1f} ms, rebuilt {rebuilt}")
+    record = {column: doc[key][column] for column in aqi_search.SearchConfig.columns}
+    assert rebuilt and record in index.search(1, 1).to_dict("records")
+
+    # Checked in the background, queries keep their local latency during a refresh
+    index.refresh_interval = latency
+    index.start()
+    requests_session.patch(url, json.dumps({f"{key}/Avg AQI": 2.0}))
+    start, values = time.perf_counter(), []
+    while record not in index.search(2, 2).to_dict("records"):
+        assert time.perf_counter() - start < 30, "Snapshot was not refreshed"
+        query = time.perf_counter()
+        index.search(*ranges[len(values) % len(ranges)])
+        values.append(time.perf_counter() - query)
+    pickup = time.perf_counter() - start
+    index.stop()
+    values = np.array(values or [0]) * 1000
+    print(
+        f"\tbackground     : change visible after {pickup * 1000:.0f} ms, "
+        f"{len(values)} queries meanwhile, p99 {np.percentile(values, 99):.3f} ms"
+    )
+    server.latency = 0
+
+
+def bench_upload(server: FirebaseStandIn, copies: int = 300, latency: float = 0.05):
+    """One PUT of the whole node against concurrent PATCH batches, and the resume of
+    an upload interrupted by failing writes"""
+    url = f"{server.base_uri}/aqi.json"
+    doc = make_aqi_doc(copies)
+    size = len(json.dumps(doc)) / 2**20
+    print(
+        f"[upload] {len(doc):,} records, {size:.1f} MiB, "
+        f"{latency * 1000:.0f} ms simulated round trip"
+    )
+    server.latency = latency
+    server.tree = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        aqi_load.push_to_firebase(url, doc)
+    elapsed = time.perf_counter() - start
+    assert server.get_node(["aqi"]) == doc
+    print(f"\tPUT              : {elapsed:6.2f}s, {size / elapsed:6.2f} MB/s")
+    for workers in (1, 4, 8):
+        server.tree = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = aqi_load.push_batches(url, doc, workers=workers)
+        assert server.get_node(["aqi"]) == doc and not stats["failed"]
+        latencies = [latency * 1000 for latency in stats["latencies"]]
+        print(
+            f"\tPATCH x{workers} workers : {stats['elapsed']:6.2f}s, "
+            f"{stats['bytes'] / 2**20 / stats['elapsed']:6.2f} MB/s, "
+            f"{stats['sent']} batches, p50 {np.percentile(latencies, 50):5.1f} ms, "
+            f"p99 {np.percentile(latencies, 99):5.1f} ms"
+        )
+
+    server.tree = {}
+    checkpoint = os.path.join(tempfile.mkdtemp(), "aqi.json.checkpoint")
+    server.writes_allowed = 20
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = aqi_load.push_batches(url, doc, checkpoint, retries=0)
+    server.writes_allowed = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        second = aqi_load.push_batches(url, doc, checkpoint)
+    assert server.get_node(["aqi"]) == doc and not os.path.exists(checkpoint)
+    print(
+        f"\tresume : {first['sent']} batches landed, {first['failed']} failed, "
+        f"then {second['skipped']} skipped and {second['sent']} sent"
+    )
+    server.latency = 0
+
+
+def bench_sync(server: FirebaseStandIn, copies: int = 300):
+    """Bytes uploaded by a daily refresh, full PUT against the manifest delta sync"""
+    url = f"{server.base_uri}/aqi.json"
+    doc = make_aqi_doc(copies)
+    # Next day: the latest month of every country is updated, a month is added for
+    # one country and one record is withdrawn
+    latest = {}
+    for key, record in doc.items():
+        group = record["Country"]
+        if group not in latest or (record["Year"], record["Month"]) > latest[group][1]:
+            latest[group] = (key, (record["Year"], record["Month"]))
+    refreshed = dict(doc)
+    for key, _ in latest.values():
+        refreshed[key] = dict(doc[key], **{"Avg AQI": doc[key]["Avg AQI"] + 1})
+    refreshed.pop(next(iter(doc)))
+    record = dict(doc[key], Month=doc[key]["Month"] % 12 + 1, Year=doc[key]["Year"] + 1)
+    refreshed["added" + key] = record
+    print(f"[sync] {len(doc):,} records, daily refresh of {len(latest) + 2} records")
+
+    server.tree = {}
+    manifest = os.path.join(tempfile.mkdtemp(), "aqi.manifest")
+    with contextlib.redirect_stdout(io.StringIO()):
+        # No manifest yet, the first sync lists the node and sends everything
+        aqi_load.sync_to_firebase(url, doc, manifest)
+    assert server.get_node(["aqi"]) == doc
+    for name, push in (
+        ("full PUT", lambda: aqi_load.push_to_firebase(url, refreshed)),
+        ("sync", lambda: aqi_load.sync_to_firebase(url, refreshed, manifest)),
+    ):
+        server.tree = {"aqi": dict(doc)}
+        received = server.bytes_received
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            push()
+        elapsed = time.perf_counter() - start
+        assert server.get_node(["aqi"]) == refreshed
+        print(
+            f"\t{name:<8} : {(server.bytes_received - received) / 1024:9.1f} KiB "
+            f"uploaded in {elapsed * 1000:7.1f} ms"
+        )
+
+    # A stale key is still deleted without a manifest, from the shallow listing
+    os.remove(manifest)
+    server.tree = {"aqi": dict(doc)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = aqi_load.sync_to_firebase(url, refreshed, manifest)
+    assert server.get_node(["aqi"]) == refreshed and stats["removed"] == 1
+
+
+class TimedMirror(aqi_search.AQIMirror):
+    """Mirror that records when each streamed Avg AQI value was applied"""
+
+    def __init__(self, db_conn_url: str):
+        super().__init__(db_conn_url)
+        self.applied = {}
+
+    def apply(self, event: str, payload: dict):
+        super().apply(event, payload)
+        if event == "patch":
+            now = time.perf_counter()
+            for child, value in payload["data"].items():
+                if child.endswith("/Avg AQI"):
+                    self.applied[value] = now
+
+
+def bench_mirror(
+    server: FirebaseStandIn, copies: int = 20, rate: int = 100, duration: float = 5
+):
+    """Staleness and query latency of the streaming mirror under steady writes"""
+    url = f"{server.base_uri}/aqi.json"
+    doc = make_aqi_doc(copies)
+    requests_session = aqi_search.requests.Session()
+    requests_session.put(url, json.dumps(doc))
+    print(
+        f"[mirror] {len(doc):,} records, {rate} updates/s for {duration:.0f}s "
+        "with queries running"
+    )
+    start = time.perf_counter()
+    mirror = TimedMirror(url).start()
+    print(f"\tinitial load : {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    sent, done = {}, threading.Event()
+
+    def write():
+        rng, keys = random.Random(0), list(doc)
+        for i in range(int(rate * duration)):
+            # Unique values so that every write can be matched to its event
+            value = 1000 + i / 1000
+            sent[value] = time.perf_counter()
+            data = {f"{rng.choice(keys)}/Avg AQI": value}
+            requests_session.patch(url, json.dumps(data))
+            time.sleep(max(0, sent[value] + 1 / rate - time.perf_counter()))
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    rng, latencies = random.Random(1), []
+    while not done.is_set():
+        low = rng.randint(0, 150)
+        start = time.perf_counter()
+        mirror.search(low, low + rng.randint(0, 20))
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.001)
+    writer.join()
+    deadline = time.perf_counter() + 5
+    while len(mirror.applied) < len(sent) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    mirror.stop()
+    assert mirror.data == server.get_node(["aqi"])
+    staleness = np.array([mirror.applied[value] - sent[value] for value in sent]) * 1000
+    latencies = np.array(latencies) * 1000
+    for name, values in (("staleness", staleness), ("query", latencies)):
+        print(
+            f"\t{name:<12} : p50 {np.percentile(values, 50):7.3f} ms, "
+            f"p99 {np.percentile(values, 99):7.3f} ms, max {values.max():7.3f} ms"
+        )
+    print(f"\t{len(latencies):,} queries, {mirror.events:,} events applied")
+
+
+if __name__ == "__main__":
+    """To run the benchmarks execute the command
+    python benchmark.py [copies of data/aqi.csv]...
+
+    Eg: python benchmark.py 10 100 1000
+    """
+    copies = tuple(int(arg) for arg in sys.argv[1:]) or (10, 100, 300)
+    bench_chunked(copies)
+    bench_parallel(max(copies))
+    bench_incremental(copies)
+    bench_handoff(max(copies))
+    server = FirebaseStandIn().start()
+    bench_search(server)
+    bench_upload(server)
+    bench_sync(server)
+    bench_mirror(server)
+    server.stop()
@@ -1,6 +1,24 @@
+import contextlib
+import hashlib
+import os
 import sys
 import json
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class UploadConfig:
+    # Firebase rejects writes larger than 16 MB, batches stay well under that
+    batch_bytes = 256 * 1024
+    workers = 8
+    retries = 3
+    backoff_factor = 0.5
+    retry_status = (429, 500, 502, 503, 504)
+    timeout = (5, 60)
 
 
 def push_to_firebase(db_url: str, data: dict) -> None:
@@ -17,15 +35,257 @@ def push_to_firebase(db_url: str, data: dict) -> None:
         print(f"Exception occured while pushing data to firebase: {e}")
 
 
+def make_batches(data: dict, batch_bytes: int = None):
+    """Splits the data into PATCH payloads of at most batch_bytes of compact JSON. A
+    record larger than that gets a payload of its own
+
+    Args:
+        data (dict): Payload
+        batch_bytes (int, optional): Size bound of a payload. Defaults to
+            UploadConfig.batch_bytes.
+
+    Yields:
+        bytes: JSON object with a subset of the keys
+    """
+    batch_bytes = batch_bytes or UploadConfig.batch_bytes
+    parts, size = [], 2
+    for key, value in data.items():
+        part = json.dumps(key) + ":" + json.dumps(value, separators=(",", ":"))
+        if parts and size + len(part) + 1 > batch_bytes:
+            yield ("{" + ",".join(parts) + "}").encode()
+            parts, size = [], 2
+        parts.append(part)
+        size += len(part) + 1
+    if parts:
+        yield ("{" + ",".join(parts) + "}").encode()
+
+
+def read_checkpoint(path: str) -> set:
+    """Digests of the batches that already landed
+
+    Args:
+        path (str): Checkpoint file, may not exist
+
+    Returns:
+        set: MD5 hex digests
+    """
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest rank percentile, 0 for no values"""
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def push_batches(
+    db_url: str,
+    data: dict,
+    checkpoint: str = None,
+    batch_bytes: int = None,
+    workers: int = None,
+    retries: int = None,
+) -> dict:
+    """Push the data to the Firebase Realtime database as size bounded PATCH batches,
+    sent concurrently over pooled connections. The digest of every batch that lands
+    is appended to the checkpoint file, and batches found there are skipped, so an
+    interrupted upload resumes where it stopped. The checkpoint is removed once all
+    the batches landed. Unlike a PUT, keys missing from data are left in place
+
+    Args:
+        db_url (str): DB connection string or URL to connect to
+        data (dict): Payload
+        checkpoint (str, optional): Checkpoint file. Defaults to None, no checkpoint.
+        batch_bytes (int, optional): Size bound of a batch. Defaults to
+            UploadConfig.batch_bytes.
+        workers (int, optional): Concurrent requests. Defaults to UploadConfig.workers.
+        retries (int, optional): Retries of a batch. Defaults to UploadConfig.retries.
+
+    Returns:
+        dict: Batches sent, skipped and failed, bytes sent, elapsed seconds and batch
+            latencies
+    """
+    workers = workers or UploadConfig.workers
+    retry = Retry(
+        total=UploadConfig.retries if retries is None else retries,
+        backoff_factor=UploadConfig.backoff_factor,
+        status_forcelist=UploadConfig.retry_status,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    landed = read_checkpoint(checkpoint)
+    stats = {"sent": 0, "skipped": 0, "failed": 0, "bytes": 0, "latencies": []}
+    lock = threading.Lock()
+    # Bounds the batches held in memory to the ones in flight and queued
+    slots = threading.BoundedSemaphore(workers * 2)
+
+    def send(payload: bytes, digest: str, log):
+        try:
+            start = time.perf_counter()
+            # print=silent answers 204 without echoing the batch back
+            resp = session.patch(
+                db_url,
+                data=payload,
+                params={"print": "silent"},
+                timeout=UploadConfig.timeout,
+            )
+            resp.raise_for_status()
+            latency = time.perf_counter() - start
+            with lock:
+                stats["sent"] += 1
+                stats["bytes"] += len(payload)
+                stats["latencies"].append(latency)
+                if log:
+                    log.write(digest + "\n")
+                    log.flush()
+        except Exception as e:
+            with lock:
+                stats["failed"] += 1
+            print(f"Exception occured while pushing a batch to firebase: {e}")
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    log = open(checkpoint, "a") if checkpoint else contextlib.nullcontext()
+    with log as log, ThreadPoolExecutor(workers) as executor:
+        for payload in make_batches(data, batch_bytes):
+            digest = hashlib.md5(payload).hexdigest()
+            if digest in landed:
+                stats["skipped"] += 1
+                continue
+            slots.acquire()
+            executor.submit(send, payload, digest, log)
+    stats["elapsed"] = time.perf_counter() - start
+    session.close()
+    if checkpoint and not stats["failed"]:
+        os.remove(checkpoint)
+
+    mb = stats["bytes"] / 2**20
+    latencies = [latency * 1000 for latency in stats["latencies"]]
+    print(
+        f"Pushed {stats['sent']} batches, {mb:.2f} MB in {stats['elapsed']:.2f}s "
+        f"({mb / stats['elapsed']:.2f} MB/s), skipped {stats['skipped']} landed "
+        f"before, {stats['failed']} failed"
+    )
+    print(
+        "Batch latency "
+        + ", ".join(f"p{q} {percentile(latencies, q):.1f} ms" for q in (50, 90, 99))
+    )
+    return stats
+
+
+# Reused, json.dumps builds a new encoder per call when given options
+canonical_json = json.JSONEncoder(sort_keys=True, separators=(",", ":")).encode
+
+
+def record_digest(value) -> str:
+    """MD5 of the canonical JSON of a record"""
+    return hashlib.md5(canonical_json(value).encode()).hexdigest()
+
+
+def manifest_path(source: str, db_url: str) -> str:
+    """Manifest file of a destination, kept next to the source file"""
+    name = hashlib.md5(db_url.encode()).hexdigest()[:12]
+    return os.path.join(os.path.dirname(source), f"firebase-{name}.manifest")
+
+
+def sync_to_firebase(db_url: str, data: dict, manifest: str) -> dict:
+    """Push only the records that changed since the last sync and delete the ones
+    that are gone. The manifest holds the digest of every record of the last
+    successful sync. Without one, the keys come from a shallow listing of the node,
+    so every record is sent but stale keys are still deleted
+
+    Args:
+        db_url (str): DB connection string or URL to connect to
+        data (dict): Payload
+        manifest (str): Manifest file of this destination
+
+    Returns:
+        dict: Keys changed, removed and unchanged, and the push_batches stats
+    """
+    digests = {key: record_digest(value) for key, value in data.items()}
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            previous = json.load(f)
+    else:
+        resp = requests.get(db_url, params={"shallow": "true"})
+        resp.raise_for_status()
+        previous = {key: None for key in resp.json() or {}}
+
+    changes = {key: data[key] for key in data if previous.get(key) != digests[key]}
+    removed = [key for key in previous if key not in data]
+    changes.update({key: None for key in removed})
+    stats = {
+        "changed": len(changes) - len(removed),
+        "removed": len(removed),
+        "unchanged": len(data) - len(changes) + len(removed),
+    }
+    print(
+        f"Syncing {stats['changed']} new or changed records, deleting "
+        f"{stats['removed']}, {stats['unchanged']} unchanged"
+    )
+    stats["push"] = push_batches(db_url, changes, manifest + ".checkpoint")
+    if not stats["push"]["failed"]:
+        with open(manifest + ".tmp", "w") as f:
+            json.dump(digests, f)
+        os.replace(manifest + ".tmp", manifest)
+    return stats
+
+
+def read_arrow_data(path: str) -> dict:
+    """Reads the data from an Arrow IPC file written by stat.py. The file is
+    memory-mapped and the keys are built with vectorized string kernels
+
+    Args:
+        path (str): File path
+
+    Returns:
+        dict: Output dict, same as read_data on the JSON file
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        string = table.schema.field("Country").type
+        keys = pc.binary_join_element_wise(
+            pc.replace_substring(pc.utf8_lower(table["Country"]), " ", "_"),
+            pc.cast(table["Year"], string),
+            pc.cast(table["Month"], string),
+            pa.scalar("", string),
+        )
+        # NaN averages are null in the JSON file
+        avg = table["Avg AQI"]
+        table = table.set_column(
+            table.schema.get_field_index("Avg AQI"),
+            "Avg AQI",
+            pc.if_else(pc.is_nan(avg), pa.scalar(None, avg.type), avg),
+        )
+        doc = dict(zip(keys.to_pylist(), table.to_pylist()))
+    return doc
+
+
 def read_data(path: str) -> dict:
     """Reads the data from file path
 
     Args:
-        path (str): File path
+        path (str): File path, .arrow and .feather files are read by read_arrow_data
 
     Returns:
         dict: Output dict
     """
+    if path.endswith((".arrow", ".feather")):
+        return read_arrow_data(path)
     with open(path, "rb") as f:
         doc = json.load(f)
     doc = {
@@ -44,14 +304,38 @@ def parse_args(line: list[str]) -> dict:
     Returns:
         dict: Arguments dictionary
     """
-    args = {"file": line[0], "source": line[1], "destination": line[2]}
+    values = [arg for arg in line[1:] if not arg.startswith("-")]
+    args = {
+        "file": line[0],
+        "source": values[0],
+        "destination": values[1],
+        "bulk": "-bulk" in line,
+        "sync": "-sync" in line,
+    }
     return args
 
 
 if __name__ == "__main__":
     """To run the file execute the command
     python load.py data/aqi.json https://test-5681a-default-rtdb.firebaseio.com/aqi.json
+    OR
+    python load.py data/aqi.arrow https://test-5681a-default-rtdb.firebaseio.com/aqi.json
+
+    Options:
+        -bulk   Upload in concurrent PATCH batches, resumable from the checkpoint file
+                <source>.checkpoint after a failure
+        -sync   Upload only the records changed since the last sync and delete the
+                removed ones, tracked in a firebase-<hash>.manifest file next to
+                the source
+    Eg: python load.py -bulk data/aqi.json https://test-5681a-default-rtdb.firebaseio.com/aqi.json
+        python load.py -sync data/aqi.json https://test-5681a-default-rtdb.firebaseio.com/aqi.json
     """
     args = parse_args(sys.argv)
     data = read_data(args["source"])
-    push_to_firebase(args["destination"], data)
+    if args["sync"]:
+        manifest = manifest_path(args["source"], args["destination"])
+        sync_to_firebase(args["destination"], data, manifest)
+    elif args["bulk"]:
+        push_batches(args["destination"], data, args["source"] + ".checkpoint")
+    else:
+        push_to_firebase(args["destination"], data)
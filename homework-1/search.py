@@ -1,8 +1,291 @@
+import bisect
+import json
 import sys
+import threading
+import time
+from operator import itemgetter
+import numpy as np
 import requests
 import pandas as pd
 
 
+class SearchConfig:
+    # Seconds between two background ETag checks of the local snapshot, None to only
+    # load it once. Every check downloads the whole node
+    refresh_interval = None
+    # (connect, read) timeouts of a snapshot download
+    timeout = (5, 60)
+    columns = ["Country", "Month", "Year"]
+    # Seconds to wait before reconnecting a dropped event stream
+    reconnect_delay = 1.0
+    # (connect, read) timeouts of the event stream, Firebase sends a keep-alive every
+    # 30 seconds so a longer silence is a dead connection
+    stream_timeout = (5, 60)
+
+
+class AQIIndex:
+    """Local snapshot of the aqi node that answers Avg AQI range queries without a
+    round trip. The records are kept in Country, Month, Year order and Avg AQI is
+    indexed by a sorted copy plus the permutation back to that order, so a range is
+    two binary searches and a sort of the matching positions. With a refresh_interval,
+    a background thread checks the node every refresh_interval seconds and swaps in
+    a new snapshot when its ETag changed, queries never wait on the network. Firebase
+    ignores If-None-Match, so every check downloads the whole node and the ETag only
+    saves the rebuild, the interval should be minutes rather than seconds.
+    """
+
+    def __init__(self, db_conn_url: str, refresh_interval: float = None):
+        """
+        Args:
+            db_conn_url (str): Database connection URI of the aqi node
+            refresh_interval (float, optional): Seconds between background ETag
+                checks, None to never refresh. Defaults to
+                SearchConfig.refresh_interval.
+        """
+        self.db_conn_url = db_conn_url
+        if refresh_interval is None:
+            refresh_interval = SearchConfig.refresh_interval
+        self.refresh_interval = refresh_interval
+        self.session = requests.Session()
+        self.etag = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.build({})
+
+    def build(self, data: dict):
+        """Rebuild the index from the records of the aqi node
+
+        Args:
+            data (dict): JSON data of the aqi node
+        """
+        # Like the startAt/endAt query, records without a numeric Avg AQI never match
+        records = [
+            record
+            for record in (data or {}).values()
+            if type(record) is dict
+            and type(record.get("Avg AQI")) in (int, float)
+            and record["Avg AQI"] == record["Avg AQI"]
+        ]
+        df = pd.DataFrame(records, columns=SearchConfig.columns + ["Avg AQI"])
+        df.sort_values(by=SearchConfig.columns, inplace=True, ignore_index=True)
+        avg = df.pop("Avg AQI").to_numpy(dtype="float64")
+        order = np.argsort(avg, kind="stable")
+        # One assignment, a concurrent search sees either the old or the new snapshot
+        self.snapshot = (df, order, avg[order])
+
+    def refresh(self) -> bool:
+        """Fetch the aqi node and rebuild the snapshot if its ETag changed
+
+        Returns:
+            bool: True if the index was rebuilt
+        """
+        resp = self.session.get(
+            self.db_conn_url,
+            headers={"X-Firebase-ETag": "true"},
+            timeout=SearchConfig.timeout,
+        )
+        resp.raise_for_status()
+        etag = resp.headers.get("ETag")
+        if etag and etag == self.etag:
+            return False
+        self.build(resp.json())
+        self.etag = etag
+        return True
+
+    def start(self):
+        """Load the first snapshot and keep it current in the background if a
+        refresh_interval is set
+
+        Returns:
+            AQIIndex: self
+        """
+        self.refresh()
+        if self.refresh_interval is None:
+            return self
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing the snapshot"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _poll(self):
+        while not self.stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Exception occured while refreshing from firebase: {e}")
+
+    def search(self, range_min: str, range_max: str) -> pd.DataFrame:
+        """Records whose Avg AQI is within the range, both ends included, in the same
+        format and order as restucture_data(search(...))
+
+        Args:
+            range_min (str): Minimum value to search
+            range_max (str): Maximum value to search
+
+        Returns:
+            pd.DataFrame: Country, Month and Year of the matching records
+        """
+        records, order, avg = self.snapshot
+        start = np.searchsorted(avg, float(range_min), side="left")
+        end = np.searchsorted(avg, float(range_max), side="right")
+        positions = np.sort(order[start:end])
+        return records.iloc[positions].reset_index(drop=True)
+
+
+class AQIMirror:
+    """In-memory mirror of the aqi node kept current by the Firebase REST streaming
+    protocol. The stream starts with a put event holding the whole node, then
+    sends a put or patch event per write. Records are indexed by a list sorted on
+    Avg AQI that is updated in place, so range queries never go over the network.
+    """
+
+    def __init__(self, db_conn_url: str):
+        """
+        Args:
+            db_conn_url (str): Database connection URI of the aqi node
+        """
+        self.db_conn_url = db_conn_url
+        self.data = {}
+        # (Avg AQI, Country, Month, Year, key) of every indexed record, sorted
+        self.entries = []
+        self.indexed = {}
+        self.events = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = None
+
+    def start(self, timeout: float = 30):
+        """Start following the node and wait for its initial content
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to 30.
+
+        Returns:
+            AQIMirror: self
+        """
+        self.thread = threading.Thread(target=self._listen, daemon=True)
+        self.thread.start()
+        assert self.ready.wait(timeout), "No initial data from %s" % self.db_conn_url
+        return self
+
+    def stop(self):
+        """Stop following the node"""
+        self.stopped.set()
+        if self.response is not None:
+            self.response.close()
+        self.thread.join()
+
+    def _listen(self):
+        while not self.stopped.is_set():
+            try:
+                with requests.get(
+                    self.db_conn_url,
+                    headers={"Accept": "text/event-stream"},
+                    stream=True,
+                    timeout=SearchConfig.stream_timeout,
+                ) as resp:
+                    resp.raise_for_status()
+                    self.response = resp
+                    event, data = None, []
+                    # chunk_size=None hands each event over as soon as it arrives
+                    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[len("event:") :].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[len("data:") :].strip())
+                        elif not line and event:
+                            self.apply(event, json.loads("\n".join(data) or "null"))
+                            event, data = None, []
+            except Exception as e:
+                if not self.stopped.is_set():
+                    print(f"Exception occured while streaming from firebase: {e}")
+            if not self.stopped.is_set():
+                time.sleep(SearchConfig.reconnect_delay)
+
+    def apply(self, event: str, payload: dict):
+        """Apply one event of the stream
+
+        Args:
+            event (str): put, patch, keep-alive, cancel or auth_revoked
+            payload (dict): Event data, {"path": ..., "data": ...} for put and patch
+        """
+        if event in ("cancel", "auth_revoked"):
+            print(f"Firebase stream {event}: {payload}")
+            return
+        if event not in ("put", "patch"):
+            return
+        keys = [key for key in payload["path"].split("/") if key]
+        if event == "put":
+            writes = [(keys, payload["data"])]
+        else:
+            writes = [
+                (keys + [k for k in child.split("/") if k], value)
+                for child, value in (payload["data"] or {}).items()
+            ]
+        with self.lock:
+            for keys, value in writes:
+                self._put(keys, value)
+            self.events += 1
+        self.ready.set()
+
+    def _put(self, keys: list, value):
+        if not keys:
+            self.data = value if type(value) is dict else {}
+            self.entries, self.indexed = [], {}
+            for key in self.data:
+                self._index(key)
+            return
+        node = self.data
+        for key in keys[:-1]:
+            if type(node.get(key)) is not dict:
+                node[key] = {}
+            node = node[key]
+        if value is None:
+            node.pop(keys[-1], None)
+        else:
+            node[keys[-1]] = value
+        self._index(keys[0])
+
+    def _index(self, key: str):
+        entry = self.indexed.pop(key, None)
+        if entry is not None:
+            del self.entries[bisect.bisect_left(self.entries, entry)]
+        record = self.data.get(key)
+        # Like the startAt/endAt query, records without a numeric Avg AQI never match
+        if type(record) is not dict or type(record.get("Avg AQI")) not in (int, float):
+            return
+        if record["Avg AQI"] != record["Avg AQI"]:
+            return
+        entry = (record["Avg AQI"], *(record.get(c) for c in SearchConfig.columns), key)
+        bisect.insort(self.entries, entry)
+        self.indexed[key] = entry
+
+    def search(self, range_min: str, range_max: str) -> pd.DataFrame:
+        """Records whose Avg AQI is within the range, both ends included, in the same
+        format and order as restucture_data(search(...))
+
+        Args:
+            range_min (str): Minimum value to search
+            range_max (str): Maximum value to search
+
+        Returns:
+            pd.DataFrame: Country, Month and Year of the matching records
+        """
+        avg = itemgetter(0)
+        with self.lock:
+            start = bisect.bisect_left(self.entries, float(range_min), key=avg)
+            end = bisect.bisect_right(self.entries, float(range_max), key=avg)
+            rows = sorted(entry[1:4] for entry in self.entries[start:end])
+        return pd.DataFrame(rows, columns=SearchConfig.columns)
+
+
 def search(db_conn_url: str, range_min: str, range_max: str) -> dict:
     """Fetch filtered data from the database. This function/query will only
     work if data inserted at "aqi" is indexed on subkey "Avg AQI"
@@ -50,11 +333,17 @@ def parse_args(line: list[str]) -> dict:
     Returns:
         dict: Arguments dictionary
     """
+    values = [arg for arg in line[1:] if not arg.startswith("-")]
+    refresh = [arg[len("-refresh=") :] for arg in line if arg.startswith("-refresh=")]
     args = {
         "file": line[0],
-        "db_conn_url": line[1],
-        "range_min": line[2],
-        "range_max": line[3],
+        "db_conn_url": values[0],
+        "range_min": values[1] if len(values) > 2 else None,
+        "range_max": values[2] if len(values) > 2 else None,
+        "ranges": list(zip(values[1::2], values[2::2])),
+        "local": "-local" in line,
+        "stream": "-stream" in line,
+        "refresh": float(refresh[-1]) if refresh else None,
     }
     return args
 
@@ -62,9 +351,35 @@ def parse_args(line: list[str]) -> dict:
 if __name__ == "__main__":
     """To run the file execute the command
     python search.py https://test-5681a-default-rtdb.firebaseio.com/aqi.json 20 30
+
+    Options:
+        -local          Answer the queries from a local sorted snapshot of the node,
+                        several min max pairs can be given, without any they are
+                        read from stdin, one pair per line
+        -refresh=<s>    With -local, check the node for changes every <s> seconds,
+                        each check downloads the whole node
+        -stream         Keep a live mirror of the node and answer the min max pairs
+                        read from stdin, one pair per line
+    Eg: python search.py -local https://test-5681a-default-rtdb.firebaseio.com/aqi.json 20 30 50 60
+        python search.py -local -refresh=600 https://test-5681a-default-rtdb.firebaseio.com/aqi.json
+        python search.py -stream https://test-5681a-default-rtdb.firebaseio.com/aqi.json
     """
     args = parse_args(sys.argv)
-    data = restucture_data(
-        search(args["db_conn_url"], args["range_min"], args["range_max"])
-    )
-    print(data)
+    if args["stream"]:
+        mirror = AQIMirror(args["db_conn_url"]).start()
+        for line in sys.stdin:
+            if line.split():
+                print(mirror.search(*line.split()[:2]))
+        mirror.stop()
+    elif args["local"]:
+        index = AQIIndex(args["db_conn_url"], args["refresh"]).start()
+        ranges = args["ranges"] or (line.split()[:2] for line in sys.stdin)
+        for pair in ranges:
+            if pair:
+                print(index.search(*pair))
+        index.stop()
+    else:
+        data = restucture_data(
+            search(args["db_conn_url"], args["range_min"], args["range_max"])
+        )
+        print(data)
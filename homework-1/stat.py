@@ -1,5 +1,101 @@
+import csv
+import hashlib
+import io
+import json
+import numpy as np
+import os
 import pandas as pd
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+class StatConfig:
+    chunk_size = 10**6
+    workers = os.cpu_count() or 4
+    date_format = "%Y-%m-%d"
+    group_by = ["Country", "Year", "Month"]
+    # Fixed dtypes so that the same row hashes alike in every chunk
+    dtypes = {"Date": str, "Country": str, "Status": str, "AQI Value": "float64"}
+    # Bytes hashed at the start of the file and before the aggregated offset to tell
+    # an appended file from a rewritten one
+    check_bytes = 64 * 1024
+
+
+class FingerprintSet:
+    """Set of 64 bit row fingerprints kept as sorted NumPy runs, about 8 bytes per
+    row where a Python set of ints takes around 70"""
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def isin(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Membership of each fingerprint
+
+        Args:
+            fingerprints (np.ndarray): uint64 fingerprints
+
+        Returns:
+            np.ndarray: Boolean mask, True where the fingerprint is in the set
+        """
+        found = np.zeros(len(fingerprints), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, fingerprints), len(run) - 1)
+            found |= run[positions] == fingerprints
+        return found
+
+    def add_new(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Add the fingerprints and flag the first occurrence of the ones not seen
+        before
+
+        Args:
+            fingerprints (np.ndarray): uint64 fingerprints
+
+        Returns:
+            np.ndarray: Boolean mask, True for the first occurrence of a new fingerprint
+        """
+        unique, first = np.unique(fingerprints, return_index=True)
+        new = ~self.isin(unique)
+        self.add_sorted(unique[new])
+        keep = np.zeros(len(fingerprints), dtype=bool)
+        keep[first[new]] = True
+        return keep
+
+    def add_sorted(self, run: np.ndarray):
+        """Add sorted fingerprints that are not in the set yet. Runs are merged like a
+        binary counter, so there are O(log n) of them to search"""
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind="stable")
+        if len(run):
+            self.runs.append(run)
+
+    def to_array(self) -> np.ndarray:
+        """All the fingerprints as one sorted array"""
+        runs = self.runs or [np.empty(0, dtype=np.uint64)]
+        return np.sort(np.concatenate(runs), kind="stable")
+
+
+class RangeFile(io.RawIOBase):
+    """Binary file object over the bytes [start, end) of a file"""
+
+    def __init__(self, filename: str, start: int, end: int):
+        self.file = open(filename, "rb")
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self.file.readinto(memoryview(buffer)[: self.remaining])
+        self.remaining -= count
+        return count
+
+    def close(self):
+        self.file.close()
+        super().close()
 
 
 def parse_args(line: list[str]) -> dict:
@@ -11,7 +107,17 @@ def parse_args(line: list[str]) -> dict:
     Returns:
         dict: Arguments dictionary
     """
-    args = {"file": line[0], "source": line[1], "destination": line[2]}
+    values = [arg for arg in line[1:] if not arg.startswith("-")]
+    args = {
+        "file": line[0],
+        "source": values[0],
+        "destination": values[1],
+        "chunked": "-chunked" in line,
+        "incremental": "-incremental" in line,
+        "workers": None,
+    }
+    if "-parallel" in line:
+        args["workers"] = int(values[2]) if len(values) > 2 else StatConfig.workers
     return args
 
 
@@ -40,6 +146,405 @@ def get_avg_aqi(filename: str) -> pd.DataFrame:
     return df
 
 
+def dedupe_rows(
+    df: pd.DataFrame, seen: FingerprintSet, only: np.ndarray = None
+) -> pd.DataFrame:
+    """Drops the rows seen before, in this chunk or in an earlier one
+
+    Args:
+        df (pd.DataFrame): Chunk of the AQI file
+        seen (FingerprintSet): Fingerprints of the rows kept so far, updated in place
+        only (np.ndarray): Sorted fingerprints, if given only these rows are kept
+
+    Returns:
+        pd.DataFrame: Rows of the chunk not seen before
+    """
+    fingerprints = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    keep = seen.add_new(fingerprints)
+    if only is not None:
+        keep &= np.isin(fingerprints, only)
+    return df[keep]
+
+
+def sum_aqi(
+    df: pd.DataFrame, date_format: str = StatConfig.date_format, dates: pd.Series = None
+) -> tuple:
+    """Partial AQI sum and count per Country, Year and Month
+
+    Args:
+        df (pd.DataFrame): Deduplicated rows of the AQI file
+        date_format (str): Format of the Date column
+        dates (pd.Series, optional): Date column already parsed. Defaults to None.
+
+    Returns:
+        tuple: Sums dataframe with sum and count columns, number of unparseable dates
+    """
+    if dates is None:
+        dates = pd.to_datetime(df["Date"], format=date_format, errors="coerce")
+    valid = dates.notna()
+    df = pd.DataFrame(
+        {
+            "Country": df["Country"][valid],
+            "Year": dates[valid].dt.year,
+            "Month": dates[valid].dt.month,
+            "AQI Value": df["AQI Value"][valid],
+        }
+    )
+    sums = df.groupby(by=StatConfig.group_by)["AQI Value"].agg(["sum", "count"])
+    return sums, int((~valid).sum())
+
+
+def empty_sums() -> pd.DataFrame:
+    """Sums dataframe without groups
+
+    Returns:
+        pd.DataFrame: Sums dataframe with sum and count columns
+    """
+    empty = pd.DataFrame(columns=list(StatConfig.dtypes)).astype(StatConfig.dtypes)
+    return sum_aqi(empty)[0]
+
+
+def merge_sums(*sums: pd.DataFrame) -> pd.DataFrame:
+    """Adds up partial sums and counts of the same groups
+
+    Returns:
+        pd.DataFrame: Sums dataframe with sum and count columns
+    """
+    return pd.concat(sums).groupby(level=StatConfig.group_by).sum()
+
+
+def avg_from_sums(sums: pd.DataFrame, invalid_dates: int = 0) -> pd.DataFrame:
+    """Turns sums and counts into the dataframe returned by get_avg_aqi
+
+    Args:
+        sums (pd.DataFrame): Sums dataframe with sum and count columns
+        invalid_dates (int): Number of rows whose Date did not parse
+
+    Returns:
+        pd.DataFrame: Aggregated dataframe
+    """
+    df = (sums["sum"] / sums["count"]).rename("Avg AQI").reset_index()
+    if invalid_dates:
+        # NaT makes Year and Month float columns in get_avg_aqi
+        df[["Year", "Month"]] = df[["Year", "Month"]].astype("float64")
+    df.sort_values(by=StatConfig.group_by, inplace=True)
+    df["Avg AQI"] = df["Avg AQI"].round(1)
+    return df
+
+
+def get_avg_aqi_chunked(
+    filename: str,
+    chunk_size: int = StatConfig.chunk_size,
+    date_format: str = StatConfig.date_format,
+) -> pd.DataFrame:
+    """Calculates avg AQI value from given file, reading it chunk by chunk. Memory
+    is bounded by the chunk size, the number of groups and 8 bytes per unique row.
+    Gives the same dataframe as get_avg_aqi for dates in date_format
+
+    Args:
+        filename (str): Path to file where AQI data is stored
+        chunk_size (int): Rows read at a time
+        date_format (str): Format of the Date column
+
+    Returns:
+        pd.DataFrame: Aggregated dataframe
+    """
+    seen = FingerprintSet()
+    sums, invalid_dates = empty_sums(), 0
+    for chunk in pd.read_csv(filename, dtype=StatConfig.dtypes, chunksize=chunk_size):
+        chunk_sums, chunk_invalid = sum_aqi(dedupe_rows(chunk, seen), date_format)
+        sums = merge_sums(sums, chunk_sums)
+        invalid_dates += chunk_invalid
+    return avg_from_sums(sums, invalid_dates)
+
+
+def split_ranges(filename: str, parts: int) -> tuple:
+    """Splits a CSV file into line aligned byte ranges. Assumes no quoted field
+    spans several lines
+
+    Args:
+        filename (str): Path to the CSV file
+        parts (int): Number of ranges wanted
+
+    Returns:
+        tuple: Column names from the header, list of (start, end) byte offsets
+    """
+    with open(filename, "rb") as f:
+        names = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        start, size = f.tell(), os.fstat(f.fileno()).st_size
+        bounds = [start]
+        for part in range(1, parts):
+            f.seek(max(start + (size - start) * part // parts, bounds[-1]))
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+        bounds.append(size)
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return names, ranges
+
+
+def map_range(
+    filename: str,
+    start: int,
+    end: int,
+    names: list,
+    chunk_size: int = StatConfig.chunk_size,
+    date_format: str = StatConfig.date_format,
+    only: np.ndarray = None,
+) -> tuple:
+    """Mapper and combiner of the parallel aggregation: sums and counts of one byte
+    range, deduplicated within the range
+
+    Args:
+        filename (str): Path to the CSV file
+        start (int): First byte of the range, at the start of a line
+        end (int): Byte after the range, at the start of a line or the end of file
+        names (list): Column names
+        chunk_size (int): Rows read at a time
+        date_format (str): Format of the Date column
+        only (np.ndarray): Sorted fingerprints, if given only these rows are summed
+
+    Returns:
+        tuple: Sums dataframe, number of unparseable dates, sorted fingerprints
+    """
+    seen = FingerprintSet()
+    sums, invalid_dates = empty_sums(), 0
+    with io.BufferedReader(RangeFile(filename, start, end)) as f:
+        for chunk in pd.read_csv(
+            f, names=names, header=None, dtype=StatConfig.dtypes, chunksize=chunk_size
+        ):
+            chunk_sums, chunk_invalid = sum_aqi(
+                dedupe_rows(chunk, seen, only), date_format
+            )
+            sums = merge_sums(sums, chunk_sums)
+            invalid_dates += chunk_invalid
+    return sums, invalid_dates, seen.to_array()
+
+
+def get_avg_aqi_parallel(
+    filename: str,
+    workers: int = StatConfig.workers,
+    chunk_size: int = StatConfig.chunk_size,
+    date_format: str = StatConfig.date_format,
+) -> pd.DataFrame:
+    """Calculates avg AQI value from given file with one mapper process per byte
+    range. The reducer adds up the partial sums and counts, then takes back the rows
+    that a range shares with an earlier one, found from the fingerprints the mappers
+    return. Gives the same dataframe as get_avg_aqi for dates in date_format
+
+    Args:
+        filename (str): Path to the CSV file, compressed files are read by
+            get_avg_aqi_chunked as they cannot be split
+        workers (int): Number of mapper processes
+        chunk_size (int): Rows read at a time by a mapper
+        date_format (str): Format of the Date column
+
+    Returns:
+        pd.DataFrame: Aggregated dataframe
+    """
+    if os.path.splitext(filename)[1].lower() != ".csv":
+        print("Cannot split %s, aggregating it in one process" % filename)
+        return get_avg_aqi_chunked(filename, chunk_size, date_format)
+    names, ranges = split_ranges(filename, workers)
+    options = (names, chunk_size, date_format)
+    with ProcessPoolExecutor(max(len(ranges), 1)) as executor:
+        mapped = [
+            executor.submit(map_range, filename, start, end, *options)
+            for start, end in ranges
+        ]
+        mapped = [future.result() for future in mapped]
+        seen, duplicates = FingerprintSet(), []
+        for (start, end), (_, _, fingerprints) in zip(ranges, mapped):
+            duplicate = seen.isin(fingerprints)
+            if duplicate.any():
+                only = fingerprints[duplicate]
+                duplicates.append(
+                    executor.submit(map_range, filename, start, end, *options, only)
+                )
+            seen.add_sorted(fingerprints[~duplicate])
+        duplicates = [future.result() for future in duplicates]
+    sums = merge_sums(empty_sums(), *(sums for sums, _, _ in mapped))
+    invalid_dates = sum(invalid for _, invalid, _ in mapped)
+    if duplicates:
+        sums = sums.sub(merge_sums(*(sums for sums, _, _ in duplicates)), fill_value=0)
+        sums = sums.astype({"count": "int64"})
+        invalid_dates -= sum(invalid for _, invalid, _ in duplicates)
+    return avg_from_sums(sums, invalid_dates)
+
+
+def file_digest(filename: str, start: int, end: int) -> str:
+    """MD5 of the bytes [start, end) of a file"""
+    with open(filename, "rb") as f:
+        f.seek(start)
+        return hashlib.md5(f.read(end - start)).hexdigest()
+
+
+def complete_end(filename: str) -> int:
+    """Offset after the last complete line, a line still being appended is left out"""
+    with open(filename, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - StatConfig.check_bytes))
+        tail = f.read()
+    return size - len(tail) + tail.rfind(b"\n") + 1
+
+
+def new_state(filename: str, date_format: str) -> dict:
+    """Aggregation state of a file with no row read yet"""
+    with open(filename, "rb") as f:
+        names = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        offset = f.tell()
+    return {
+        "date_format": date_format,
+        "names": names,
+        "offset": offset,
+        "head": file_digest(filename, 0, min(offset, StatConfig.check_bytes)),
+        "tail": file_digest(filename, max(0, offset - StatConfig.check_bytes), offset),
+        "mark": None,
+        "mark_fingerprints": [],
+        "invalid_fingerprints": [],
+        "invalid_dates": 0,
+        # Column lists of the sums dataframe, with the group columns
+        "groups": {column: [] for column in StatConfig.group_by + ["sum", "count"]},
+    }
+
+
+def read_state(state_path: str, filename: str, date_format: str) -> dict:
+    """Loads the aggregation state persisted for a file, if the file was only appended
+    to since. Rows rewritten elsewhere than the first and the last check_bytes
+    before the offset are not noticed
+
+    Args:
+        state_path (str): State file
+        filename (str): Path to the CSV file
+        date_format (str): Format of the Date column
+
+    Returns:
+        dict: State, None when it is missing or does not apply to the file anymore
+    """
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        state = json.load(f)
+    offset = state["offset"]
+    head = file_digest(filename, 0, min(offset, StatConfig.check_bytes))
+    tail = file_digest(filename, max(0, offset - StatConfig.check_bytes), offset)
+    if state["date_format"] != date_format:
+        reason = "was aggregated with another date format"
+    elif os.path.getsize(filename) < offset:
+        reason = "shrank"
+    elif (head, tail) != (state["head"], state["tail"]):
+        reason = "changed before the aggregated rows"
+    else:
+        return state
+    print(f"{filename} {reason}, recomputing from the start")
+    return None
+
+
+def sums_from_state(state: dict) -> pd.DataFrame:
+    """Sums dataframe of the persisted groups, with the dtypes of sum_aqi"""
+    empty = empty_sums()
+    df = pd.DataFrame(state["groups"]).astype(empty.reset_index().dtypes.to_dict())
+    return merge_sums(empty, df.set_index(StatConfig.group_by))
+
+
+def update_state(state: dict, filename: str, chunk_size: int) -> bool:
+    """Aggregates the rows from the offset of the state to the last complete line
+    into the state. Duplicates of earlier rows can only be dated at the high-water
+    mark or be unparseable, so only those fingerprints are kept
+
+    Args:
+        state (dict): Aggregation state, updated in place
+        filename (str): Path to the CSV file
+        chunk_size (int): Rows read at a time
+
+    Returns:
+        bool: False, with the state left as it was, if a row is dated before the mark
+    """
+    end = complete_end(filename)
+    old_mark = mark = pd.Timestamp(state["mark"]) if state["mark"] else None
+    seen = FingerprintSet()
+    fingerprints = state["mark_fingerprints"] + state["invalid_fingerprints"]
+    seen.add_sorted(np.unique(np.array(fingerprints, dtype=np.uint64)))
+    at_mark = [np.array(state["mark_fingerprints"], dtype=np.uint64)]
+    invalid = [np.array(state["invalid_fingerprints"], dtype=np.uint64)]
+    sums, invalid_dates = sums_from_state(state), state["invalid_dates"]
+
+    with io.BufferedReader(RangeFile(filename, state["offset"], end)) as f:
+        for chunk in pd.read_csv(
+            f,
+            names=state["names"],
+            header=None,
+            dtype=StatConfig.dtypes,
+            chunksize=chunk_size,
+        ):
+            fingerprints = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = seen.add_new(fingerprints)
+            chunk, fingerprints = chunk[keep], fingerprints[keep]
+            dates = pd.to_datetime(
+                chunk["Date"], format=state["date_format"], errors="coerce"
+            )
+            if old_mark is not None and (dates < old_mark).any():
+                return False
+            invalid.append(fingerprints[dates.isna().to_numpy()])
+            chunk_mark = dates.max()
+            if pd.notna(chunk_mark):
+                if mark is None or chunk_mark > mark:
+                    mark, at_mark = chunk_mark, []
+                at_mark.append(fingerprints[(dates == mark).to_numpy()])
+            chunk_sums, chunk_invalid = sum_aqi(chunk, dates=dates)
+            sums = merge_sums(sums, chunk_sums)
+            invalid_dates += chunk_invalid
+
+    groups = sums.reset_index()
+    state.update(
+        offset=end,
+        head=file_digest(filename, 0, min(end, StatConfig.check_bytes)),
+        tail=file_digest(filename, max(0, end - StatConfig.check_bytes), end),
+        mark=mark.isoformat() if mark is not None else None,
+        mark_fingerprints=np.concatenate(at_mark).tolist(),
+        invalid_fingerprints=np.concatenate(invalid).tolist(),
+        invalid_dates=invalid_dates,
+        groups={column: groups[column].tolist() for column in groups},
+    )
+    return True
+
+
+def get_avg_aqi_incremental(
+    filename: str,
+    state_path: str,
+    chunk_size: int = StatConfig.chunk_size,
+    date_format: str = StatConfig.date_format,
+) -> pd.DataFrame:
+    """Calculates avg AQI value from given append-only file, reading only the rows
+    added since the last run. Sums and counts per group are persisted in the state
+    file along with a high-water mark on Date. A row dated before the mark, or a
+    change to the rows already read, means the file was not only appended to and
+    everything is recomputed. Gives the same dataframe as get_avg_aqi for dates in
+    date_format
+
+    Args:
+        filename (str): Path to the CSV file, compressed files are always recomputed
+        state_path (str): State file, created if missing
+        chunk_size (int): Rows read at a time
+        date_format (str): Format of the Date column
+
+    Returns:
+        pd.DataFrame: Aggregated dataframe
+    """
+    if os.path.splitext(filename)[1].lower() != ".csv":
+        print("Cannot append to %s, aggregating all of it" % filename)
+        return get_avg_aqi_chunked(filename, chunk_size, date_format)
+    state = read_state(state_path, filename, date_format)
+    if state is None or not update_state(state, filename, chunk_size):
+        if state is not None:
+            print(f"{filename} has rows before {state['mark']}, recomputing")
+        state = new_state(filename, date_format)
+        update_state(state, filename, chunk_size)
+    with open(state_path + ".tmp", "w") as f:
+        f.write(json.dumps(state))
+    os.replace(state_path + ".tmp", state_path)
+    return avg_from_sums(sums_from_state(state), state["invalid_dates"])
+
+
 def save_as_json(df: pd.DataFrame, save_to: str):
     try:
         df.to_json(save_to, orient="records")
@@ -48,12 +553,51 @@ def save_as_json(df: pd.DataFrame, save_to: str):
         print("Error saving data to %s" % e)
 
 
+def save_as_arrow(df: pd.DataFrame, save_to: str):
+    """Saves the dataframe as an uncompressed Arrow IPC (Feather V2) file, which
+    load.py memory-maps instead of parsing JSON
+
+    Args:
+        df (pd.DataFrame): Aggregated dataframe
+        save_to (str): Path of the .arrow or .feather file
+    """
+    try:
+        import pyarrow.feather as feather
+
+        feather.write_feather(df, save_to, compression="uncompressed")
+        print("Successfully saved %s" % save_to)
+    except Exception as e:
+        print("Error saving data to %s" % e)
+
+
 if __name__ == "__main__":
     """To run the file execute the command
     python stat.py data/aqi.csv data/aqi.json
     OR
     python stat.py data/aqi.zip data/aqi.json
+    OR, to hand the data to load.py as a memory-mappable Arrow file
+    python stat.py data/aqi.csv data/aqi.arrow
+
+    Options:
+        -chunked        Aggregate the file chunk by chunk, for files larger than memory
+        -parallel       Aggregate byte ranges of the file in worker processes, one per
+                        core unless a number of workers follows the destination
+        -incremental    Only aggregate the rows appended since the last run, the state
+                        is kept in <destination>.state
+    Eg: python stat.py -chunked data/aqi.csv data/aqi.json
+        python stat.py -parallel data/aqi.csv data/aqi.json 4
+        python stat.py -incremental data/aqi.csv data/aqi.json
     """
     args = parse_args(sys.argv)
-    df = get_avg_aqi(args["source"])
-    save_as_json(df, args["destination"])
+    if args["incremental"]:
+        df = get_avg_aqi_incremental(args["source"], args["destination"] + ".state")
+    elif args["workers"]:
+        df = get_avg_aqi_parallel(args["source"], args["workers"])
+    elif args["chunked"]:
+        df = get_avg_aqi_chunked(args["source"])
+    else:
+        df = get_avg_aqi(args["source"])
+    if args["destination"].endswith((".arrow", ".feather")):
+        save_as_arrow(df, args["destination"])
+    else:
+        save_as_json(df, args["destination"])
@@ -0,0 +1,670 @@
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import operator
+import os
+import tempfile
+import threading
+import sys
+import time
+import timeit
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+
+from edfs import (
+    AsyncHDFSEmulator,
+    BlockConfig,
+    FirebaseClient,
+    HDFSEmulator,
+    dict2xml,
+    fs2xml,
+)
+
+
+class FirebaseStandIn(ThreadingHTTPServer):
+    """Local, in-memory stand-in for the Firebase Realtime DB REST API. It keeps the
+    whole database as one JSON tree and serves it over HTTP/1.1 keep-alive connections,
+    with children sorted by key like Firebase does.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), FirebaseHandler)
+        self.tree = None
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.requests = 0
+        # Simulated network round trip, in seconds
+        self.latency = 0
+        self.connections = 0
+
+    @property
+    def base_uri(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def get_node(self, keys: list):
+        node = self.tree
+        for key in keys:
+            if type(node) is not dict or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def set_node(self, keys: list, value):
+        value = prune(value)
+        if value is None and self.get_node(keys) is None:
+            return
+        if not keys:
+            self.tree = value if value != {} else None
+            return
+        if type(self.tree) is not dict:
+            self.tree = {}
+        node, parents = self.tree, []
+        for key in keys[:-1]:
+            if type(node.get(key)) is not dict:
+                node[key] = {}
+            parents.append((node, key))
+            node = node[key]
+        if value is None or value == {}:
+            node.pop(keys[-1], None)
+        else:
+            node[keys[-1]] = value
+        # Firebase does not keep empty nodes around
+        for parent, key in reversed(parents):
+            if parent[key]:
+                break
+            del parent[key]
+        if not self.tree:
+            self.tree = None
+
+
+def prune(value):
+    """Drop null and empty children, Firebase does not store them"""
+    if type(value) is not dict:
+        return value
+    res = {}
+    for key, child in value.items():
+        child = prune(child)
+        if child is not None and child != {}:
+            res[key] = child
+    return res or None
+
+
+def sort_key(value) -> tuple:
+    """Firebase ordering: null, false, true, numbers, strings, objects"""
+    if value is None:
+        return (0, 0)
+    if value is False or value is True:
+        return (1, value)
+    if type(value) in (int, float):
+        return (2, value)
+    if type(value) is str:
+        return (3, value)
+    return (4, 0)
+
+
+def apply_query(value, query: dict):
+    """Apply Firebase REST query parameters to a node"""
+    if type(value) is not dict:
+        return value
+    if query.get("shallow") == "true":
+        return {k: True if type(v) is dict else v for k, v in value.items()}
+    if "orderBy" not in query:
+        return value
+
+    order_by = json.loads(query["orderBy"])
+    if order_by == "$key":
+        extract = operator.itemgetter(0)
+    elif order_by == "$value":
+        extract = operator.itemgetter(1)
+    else:
+
+        def extract(item):
+            return item[1].get(order_by) if type(item[1]) is dict else None
+
+    items = sorted(value.items(), key=lambda item: (sort_key(extract(item)), item[0]))
+    if "equalTo" in query:
+        equal = sort_key(json.loads(query["equalTo"]))
+        items = [item for item in items if sort_key(extract(item)) == equal]
+    if "startAt" in query:
+        start = sort_key(json.loads(query["startAt"]))
+        items = [item for item in items if sort_key(extract(item)) >= start]
+    if "endAt" in query:
+        end = sort_key(json.loads(query["endAt"]))
+        items = [item for item in items if sort_key(extract(item)) <= end]
+    if "limitToFirst" in query:
+        items = items[: int(query["limitToFirst"])]
+    if "limitToLast" in query:
+        items = items[-int(query["limitToLast"]) :]
+    return dict(items)
+
+
+class FirebaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def handle_one_request(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        super().handle_one_request()
+
+    def _keys(self) -> list:
+        path = urlsplit(self.path).path
+        assert path.endswith(".json"), "Path must end with .json"
+        return [unquote(key) for key in path[: -len(".json")].split("/") if key]
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _reply(self, value, status: int = 200):
+        if status == 200 and self._query().get("print") == "silent":
+            self._send(b"", 204)
+            return
+        self._send(json.dumps(value).encode(), status)
+
+    def _send(self, body: bytes, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+            self.server.requests += 1
+        self.wfile.write(body)
+
+    def _query(self) -> dict:
+        query = parse_qs(urlsplit(self.path).query)
+        return {key: values[-1] for key, values in query.items()}
+
+    def do_GET(self):
+        query = self._query()
+        if query:
+            with self.server.lock:
+                value = apply_query(self.server.get_node(self._keys()), query)
+                # Serialize while holding the lock, the tree may change afterwards
+                body = json.dumps(value, sort_keys=True).encode()
+            self._send(body)
+            return
+
+        # Whole subtrees are streamed with chunked encoding so that the stand-in does
+        # not hold a serialized copy of the tree
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with self.server.lock:
+            parts, size = [], 0
+            encoder = json.JSONEncoder(sort_keys=True)
+            for part in encoder.iterencode(self.server.get_node(self._keys())):
+                parts.append(part)
+                size += len(part)
+                if size >= 65536:
+                    self._send_chunk("".join(parts).encode())
+                    parts, size = [], 0
+            self._send_chunk("".join(parts).encode())
+            self.wfile.write(b"0\r\n\r\n")
+            self.server.requests += 1
+
+    def _send_chunk(self, chunk: bytes):
+        if chunk:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.server.bytes_sent += len(chunk)
+
+    def do_PUT(self):
+        value = self._body()
+        with self.server.lock:
+            self.server.set_node(self._keys(), value)
+        self._reply(value)
+
+    def do_PATCH(self):
+        data = self._body()
+        keys = self._keys()
+        with self.server.lock:
+            for path, value in data.items():
+                self.server.set_node(keys + [k for k in path.split("/") if k], value)
+        self._reply(data)
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.set_node(self._keys(), None)
+        self._reply(None)
+
+
+def bench_connection_reuse(server: FirebaseStandIn, n: int = 200):
+    """Compare module level requests calls against the pooled FirebaseClient session"""
+    start_conns = server.connections
+    start = time.perf_counter()
+    for i in range(n):
+        requests.put(f"{server.base_uri}/bench/n{i}.json", data=json.dumps(i))
+        requests.get(f"{server.base_uri}/bench/n{i}.json")
+    plain = time.perf_counter() - start
+    plain_conns = server.connections - start_conns
+
+    client = FirebaseClient(base_uri=server.base_uri)
+    start_conns = server.connections
+    start = time.perf_counter()
+    for i in range(n):
+        client.put(f"/bench/n{i}", i)
+        client.get(f"/bench/n{i}.json")
+    pooled = time.perf_counter() - start
+    pooled_conns = server.connections - start_conns
+
+    print(f"[connection reuse] {2 * n} requests")
+    print(f"\trequests.*       : {plain:.3f}s, {plain_conns} connections")
+    print(f"\tFirebaseClient   : {pooled:.3f}s, {pooled_conns} connections")
+    print(f"\tclient counters  : {client.connection_stats()}")
+    client.close()
+
+
+def bench_mkdir(server: FirebaseStandIn, n: int = 50):
+    """Time HDFSEmulator mkdir and create on 3 level paths through one pooled emulator,
+    with and without the namespace cache"""
+    print(f"[mkdir + create] {n} x (mkdir /user/dir, create /user/dir/file.txt)")
+    for cache in (False, True):
+        server.tree = None
+        fs = HDFSEmulator("-mkdir", "/", base_uri=server.base_uri, cache=cache)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(n):
+                fs.mkdir(f"/user{i}/dir{i}")
+                fs.create(f"/user{i}/dir{i}/file{i}.txt")
+        elapsed = time.perf_counter() - start
+        print(f"\tcache={str(cache):<5}      : {elapsed:.3f}s")
+        print(f"\t\tclient counters: {fs.connection_stats()}")
+        print(f"\t\tcache counters : {fs.cache_stats()}")
+        fs.close()
+
+
+def make_tree(depth: int, fanout: int, files: int, content_size: int = 1024) -> dict:
+    """Build a synthetic emulator namespace, `fanout` directories per level down to
+    `depth` with `files` files in every directory"""
+
+    def node(name: str, type_: str) -> dict:
+        return {"type": type_, "name": name, "id": uuid.uuid4().hex}
+
+    root = {}
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for f in range(files):
+                parent[f"file{f}"] = node(f"file{f}.txt", "FILE")
+                parent[f"file{f}"]["content"] = "x" * content_size
+            if d < depth - 1:
+                for i in range(fanout):
+                    parent[f"dir{i}"] = node(f"dir{i}", "DIR")
+                    next_level.append(parent[f"dir{i}"])
+        level = next_level
+    return root
+
+
+def bench_payload_size(server: FirebaseStandIn, depth: int = 6, fanout: int = 4):
+    """Compare bytes downloaded by full subtree GETs and shallow queries"""
+    server.tree = make_tree(depth, fanout, files=3)
+    fs = HDFSEmulator("-ls", "/", base_uri=server.base_uri, cache=False)
+    checks = {
+        "exists /dir0": (
+            lambda: fs.get("/dir0.json"),
+            lambda: fs._dir_exists("/dir0"),
+        ),
+        "exists /dir0/file0.txt": (
+            lambda: fs.get("/dir0/file0.json"),
+            lambda: fs._file_exists("/dir0/file0.txt"),
+        ),
+        "is empty /dir0": (
+            lambda: fs.get("/dir0.json"),
+            lambda: fs._is_dir_empty("/dir0"),
+        ),
+        "ls /": (
+            lambda: fs.get("/.json"),
+            lambda: fs.ls("/"),
+        ),
+    }
+    print(f"[payload size] synthetic tree depth={depth} fanout={fanout}")
+    for name, (full, shallow) in checks.items():
+        sizes = []
+        for check in (full, shallow):
+            start = server.bytes_sent
+            with contextlib.redirect_stdout(io.StringIO()):
+                check()
+            sizes.append(server.bytes_sent - start)
+        print(f"\t{name:<24}: full {sizes[0]:>10,} B, shallow {sizes[1]:>7,} B")
+    fs.close()
+
+
+def bench_batch(server: FirebaseStandIn, users: int = 10, files: int = 100):
+    """Compare one emulator per command against a single batch mode run"""
+    commands = []
+    for u in range(users):
+        commands.append(f"-mkdir /user{u}/data")
+        commands.extend(f"-create /user{u}/data/file{f}.txt" for f in range(files))
+    path = os.path.join(tempfile.mkdtemp(), "commands.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(commands))
+
+    print(f"[batch] {len(commands)} mkdir/create commands")
+    server.tree = None
+    start_requests = server.requests
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for line in commands:
+            command, action_item = line.split(" ")
+            fs = HDFSEmulator(command, action_item, base_uri=server.base_uri)
+            fs.execute()
+            fs.close()
+    elapsed = time.perf_counter() - start
+    requests_sent = server.requests - start_requests
+    print(f"\tone per command   : {elapsed:.3f}s, {requests_sent} requests")
+
+    server.tree = None
+    start_requests = server.requests
+    fs = HDFSEmulator("-batch", path, base_uri=server.base_uri)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fs.execute()
+    elapsed = time.perf_counter() - start
+    requests_sent = server.requests - start_requests
+    print(f"\tbatch mode        : {elapsed:.3f}s, {requests_sent} requests")
+    fs.close()
+
+
+def recursive_xml(tree: dict) -> str:
+    """fs_parser + dict2xml and the line filters of the original export, kept as the
+    benchmark baseline"""
+    parser = HDFSEmulator.__new__(HDFSEmulator)
+    res = dict2xml({"root": parser.fs_parser(tree)})
+    res = [line for line in res.split("\n") if line.strip() != ""]
+    res = [line for line in res if not all([x in line for x in ["</", "/>"]])]
+    return "\n".join(res)
+
+
+def export_in_memory(fs: HDFSEmulator, output_path: str):
+    """The export pipeline before streaming, kept as the benchmark baseline"""
+    with open(output_path, "w") as f:
+        f.write(recursive_xml(fs.get("/.json")))
+
+
+def bench_export(server: FirebaseStandIn, depth: int = 6, fanout: int = 5):
+    """Compare time and peak traced memory of the in-memory and streaming exports"""
+    server.tree = make_tree(depth, fanout, files=4, content_size=64)
+    fs = HDFSEmulator("-export", "/", base_uri=server.base_uri)
+    output_dir = tempfile.mkdtemp()
+    print(f"[export] synthetic tree depth={depth} fanout={fanout}")
+    outputs = []
+    for name, export in (
+        ("in-memory", export_in_memory),
+        ("streaming", lambda fs, path: fs.export(path)),
+    ):
+        output_path = os.path.join(output_dir, f"{name}.xml")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            export(fs, output_path)
+        elapsed = time.perf_counter() - start
+        # Traced separately, tracemalloc slows down allocation heavy code
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            export(fs, output_path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(output_path) as f:
+            outputs.append(f.read())
+        print(f"\t{name:<17} : {elapsed:.3f}s, peak {peak / 2**20:.1f} MiB")
+    print(f"\tidentical output  : {outputs[0] == outputs[1]}")
+    fs.close()
+
+
+def bench_rmr(server: FirebaseStandIn, depth: int = 4, fanout: int = 4):
+    """Compare -rmr against removing the tree one -rm/-rmdir invocation at a time"""
+    tree = make_tree(depth, fanout, files=3)
+    # Bottom-up command list, as a user without -rmr would have to run it
+    commands, stack = [], [("/big", tree)]
+    while stack:
+        path, node = stack.pop()
+        commands.append(("-rmdir", path))
+        for key, child in node.items():
+            if type(child) is dict and child["type"] == "FILE":
+                commands.append(("-rm", f"{path}/{child['name']}"))
+            elif type(child) is dict:
+                stack.append((f"{path}/{key}", child))
+    commands.reverse()
+    big = {"big": dict(tree, type="DIR", name="big", id="0" * 32)}
+
+    print(f"[rmr] {len(commands)} nodes, depth={depth} fanout={fanout}")
+    server.tree = copy.deepcopy(big)
+    start_requests = server.requests
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for command, path in commands:
+            fs = HDFSEmulator(command, path, base_uri=server.base_uri)
+            fs.execute()
+            fs.close()
+    elapsed = time.perf_counter() - start
+    assert server.tree is None
+    requests_sent = server.requests - start_requests
+    print(f"\tone by one        : {elapsed:.3f}s, {requests_sent} requests")
+
+    server.tree = copy.deepcopy(big)
+    start_requests = server.requests
+    fs = HDFSEmulator("-rmr", "/big", base_uri=server.base_uri)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fs.rmr("/big", batch_size=50)
+    elapsed = time.perf_counter() - start
+    assert server.tree is None
+    requests_sent = server.requests - start_requests
+    print(f"\t-rmr              : {elapsed:.3f}s, {requests_sent} requests")
+    fs.close()
+
+
+def bench_async(server: FirebaseStandIn, latency: float = 0.02, files: int = 100):
+    """Compare sequential and asyncio mkdir -p and bulk create with a simulated round
+    trip latency"""
+    print(f"[async] simulated latency {latency * 1000:.0f} ms")
+    server.latency = latency
+    try:
+        for mode in ("sequential", "asyncio"):
+            server.tree = None
+            fs = HDFSEmulator("-mkdir", "/", base_uri=server.base_uri)
+            paths = [f"/user/data/file{i}.txt" for i in range(files)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                if mode == "sequential":
+                    for path in ("/a", "/a/b", "/a/b/c", "/a/b/c/d"):
+                        fs.mkdir(path)
+                else:
+                    asyncio.run(AsyncHDFSEmulator(fs).mkdir_p("/a/b/c/d"))
+                mkdir_elapsed = time.perf_counter() - start
+
+                fs.mkdir("/user/data")
+                start = time.perf_counter()
+                if mode == "sequential":
+                    for path in paths:
+                        fs.create(path)
+                else:
+                    asyncio.run(AsyncHDFSEmulator(fs).create_many(paths))
+                create_elapsed = time.perf_counter() - start
+            print(
+                f"\t{mode:<17} : mkdir -p /a/b/c/d {mkdir_elapsed:.3f}s, "
+                f"create {files} files {create_elapsed:.3f}s"
+            )
+            fs.close()
+    finally:
+        server.latency = 0
+
+
+def bench_backends(server: FirebaseStandIn, n: int = 200, latency: float = 0.005):
+    """Per operation latency of the Firebase stand-in and the embedded SQLite backend"""
+    db_path = os.path.join(tempfile.mkdtemp(), "edfs.db")
+    backends = {
+        "firebase stand-in": server.base_uri,
+        f"firebase +{latency * 1000:.0f}ms": server.base_uri,
+        "sqlite": f"sqlite://{db_path}",
+    }
+    ops = {
+        "mkdir": lambda fs, i: fs.mkdir(f"/user/dir{i}"),
+        "create": lambda fs, i: fs.create(f"/user/dir{i}/file.txt"),
+        "exists": lambda fs, i: fs._dir_exists(f"/user/dir{i}"),
+        "ls": lambda fs, i: fs.ls(f"/user/dir{i}"),
+        "rm": lambda fs, i: fs.rm(f"/user/dir{i}/file.txt"),
+        "rmdir": lambda fs, i: fs.rmdir(f"/user/dir{i}"),
+    }
+    print(f"[backends] mean latency per operation over {n} operations (ms)")
+    print("\t" + " " * 18 + "".join(f"{op:>9}" for op in ops))
+    for name, base_uri in backends.items():
+        server.tree = None
+        server.latency = latency if "+" in name else 0
+        fs = HDFSEmulator("-ls", "/", base_uri=base_uri, cache=False)
+        timings = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            fs.mkdir("/user")
+            for op in ops.values():
+                start = time.perf_counter()
+                for i in range(n):
+                    op(fs, i)
+                timings.append((time.perf_counter() - start) / n * 1000)
+        print(f"\t{name:<18}" + "".join(f"{t:>9.3f}" for t in timings))
+        fs.close()
+    server.latency = 0
+
+
+def bench_blocks(server: FirebaseStandIn, size_mb: int = 16, latency: float = 0.05):
+    """Throughput of -put and -cat with one and with several blocks in flight, and the
+    bytes a listing of the parent directory downloads"""
+    local_path = os.path.join(tempfile.mkdtemp(), "local.bin")
+    data = os.urandom(size_mb * 1024 * 1024)
+    with open(local_path, "wb") as f:
+        f.write(data)
+
+    print(f"[blocks] {size_mb} MiB file, {BlockConfig.block_size // 1024} KiB blocks")
+    workers = BlockConfig.workers
+    server.latency = latency
+    try:
+        for BlockConfig.workers in (1, workers):
+            server.tree = None
+            fs = HDFSEmulator(
+                "-put", "/", base_uri=server.base_uri, options=[local_path]
+            )
+            out = io.TextIOWrapper(io.BytesIO())
+            with contextlib.redirect_stdout(out):
+                fs.mkdir("/user")
+                start = time.perf_counter()
+                fs.put_file("/user/local.bin")
+                put_elapsed = time.perf_counter() - start
+                start = time.perf_counter()
+                fs.cat("/user/local.bin")
+                cat_elapsed = time.perf_counter() - start
+                sent = server.bytes_sent
+                fs.ls("/user")
+                ls_bytes = server.bytes_sent - sent
+            assert out.buffer.getvalue().endswith(data)
+            print(
+                f"\t{BlockConfig.workers} in flight : "
+                f"put {size_mb / put_elapsed:7.1f} MB/s, "
+                f"cat {size_mb / cat_elapsed:7.1f} MB/s, ls /user {ls_bytes:,} bytes"
+            )
+            fs.close()
+    finally:
+        BlockConfig.workers = workers
+        server.latency = 0
+
+
+def make_sized_tree(nodes: int, fanout: int = 8) -> dict:
+    """Build a synthetic namespace with `nodes` nodes, every directory holding `fanout`
+    sub directories and `fanout` files"""
+    root = {}
+    level, count = [root], 0
+    while count < nodes:
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                if count >= nodes:
+                    break
+                name = f"file{i}.txt" if i % 2 else f"dir{i}"
+                node = {
+                    "type": "FILE" if i % 2 else "DIR",
+                    "name": name,
+                    "id": "0" * 32,
+                }
+                parent[name.split(".")[0]] = node
+                count += 1
+                if not i % 2:
+                    next_level.append(node)
+        level = next_level
+    return root
+
+
+def bench_serializer(max_nodes: int = 10**5, deep: int = 10**4):
+    """Compare fs_parser + dict2xml + line filters against the single pass fs2xml"""
+    print("[serializer] fs_parser + dict2xml vs fs2xml")
+    nodes = 10**3
+    while nodes <= max_nodes:
+        tree = make_sized_tree(nodes)
+        assert recursive_xml(tree) == fs2xml(tree)
+        repeat = max(1, 10**5 // nodes)
+        old = min(timeit.repeat(lambda: recursive_xml(tree), number=repeat, repeat=3))
+        new = min(timeit.repeat(lambda: fs2xml(tree), number=repeat, repeat=3))
+        print(
+            f"\t{nodes:>9,} nodes  : recursive {old / repeat * 1000:9.2f} ms, "
+            f"fs2xml {new / repeat * 1000:9.2f} ms ({old / new:.1f}x)"
+        )
+        nodes *= 10
+
+    chain = node = {}
+    for i in range(deep):
+        node["d"] = {"type": "DIR", "name": "d", "id": "0" * 32}
+        node = node["d"]
+    try:
+        recursive_xml(chain)
+        status = "ok"
+    except RecursionError:
+        status = "RecursionError"
+    start = time.perf_counter()
+    fs2xml(chain)
+    elapsed = time.perf_counter() - start
+    print(f"\t{deep:,} deep chain : recursive {status}, fs2xml {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    """To run the benchmarks against a local Firebase stand-in execute the command
+    python benchmark.py [max-serializer-nodes]
+
+    Eg: python benchmark.py 1000000
+    """
+    server = FirebaseStandIn().start()
+    try:
+        bench_connection_reuse(server)
+        bench_mkdir(server)
+        bench_payload_size(server)
+        bench_batch(server)
+        bench_export(server)
+        bench_rmr(server)
+        bench_async(server)
+        bench_backends(server)
+        bench_blocks(server)
+        bench_serializer(int(sys.argv[1]) if len(sys.argv) > 1 else 10**5)
+    finally:
+        server.stop()
@@ -1,51 +1,429 @@
+import asyncio
+import base64
+import codecs
+import contextlib
+import io
+import itertools
 import json
+import os
+import re
+import sqlite3
 import sys
+import threading
+import time
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class FirebaseConfig:
     """Firebase Realtime DB config"""
 
-    base_uri = "https://test-5681a-default-rtdb.firebaseio.com"
+    # Firebase DB URL, or "sqlite:///path/to/edfs.db" for the local embedded backend
+    base_uri = os.environ.get(
+        "EDFS_BASE_URI", "https://test-5681a-default-rtdb.firebaseio.com"
+    )
+
+    # HTTP connection pool and retry settings
+    pool_size = 10
+    timeout = (3.05, 30)
+    retries = 3
+    backoff_factor = 0.3
+    retry_status = (429, 500, 502, 503, 504)
+
+
+class SQLiteClient:
+    """Local embedded storage with the GET, PUT, PATCH & DELETE surface of
+    `FirebaseClient`. The JSON tree is kept in a path indexed table with parent pointers,
+    one row per node, so shallow lookups are index lookups instead of round trips."""
+
+    def __init__(self, db_path: str = ":memory:"):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS node (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                value TEXT
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS node_parent ON node (parent);
+            """
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @staticmethod
+    def _path(endpoint: str) -> str:
+        """Firebase endpoint or path to table path, "/a/b.json" -> "a/b" """
+        endpoint = endpoint[: -len(".json")] if endpoint.endswith(".json") else endpoint
+        return "/".join(key for key in endpoint.split("/") if key)
+
+    @staticmethod
+    def _join(path: str, key: str) -> str:
+        return f"{path}/{key}" if path else key
+
+    def connection_stats(self) -> dict:
+        """Request counters, an embedded database always reuses its one connection"""
+        return {
+            "requests": self.requests,
+            "connections": 1,
+            "reused": self.requests - 1,
+        }
+
+    def close(self):
+        self.connection.close()
+
+    def _iter_rows(self, path: str):
+        """Rows of a subtree in depth first order, parents before their children"""
+        # "/" sorts after "-" and "." so order on the path with "/" as the lowest char
+        order = "ORDER BY replace(path, '/', char(1))"
+        if not path:
+            return self.connection.execute(f"SELECT path, value FROM node {order}")
+        return self.connection.execute(
+            f"SELECT path, value FROM node WHERE path = ? OR (path > ? AND path < ?) "
+            f"{order}",
+            (path, f"{path}/", f"{path}0"),
+        )
+
+    def _read(self, path: str):
+        root = None
+        nodes = {}
+        for row_path, value in self._iter_rows(path):
+            value = {} if value is None else json.loads(value)
+            if row_path == path:
+                root = nodes[path] = value
+                continue
+            if root is None:
+                root = nodes[path] = {}
+            parent, _, key = row_path.rpartition("/")
+            nodes[parent][key] = value
+            if type(value) is dict:
+                nodes[row_path] = value
+        return None if root == {} else root
+
+    def _write(self, path: str, data):
+        self._remove(path)
+        # Only values are stored, nodes exist as long as they hold a value
+        rows, stack = [], [(path, data)]
+        while stack:
+            node_path, value = stack.pop()
+            if type(value) is dict:
+                stack.extend(
+                    (self._join(node_path, key), child) for key, child in value.items()
+                )
+            elif value is not None:
+                rows.append(
+                    (node_path, node_path.rpartition("/")[0], json.dumps(value))
+                )
+        if not rows:
+            self._prune(path)
+            return
+        nodes = set()
+        for row_path, parent, _ in rows:
+            while parent not in nodes and len(parent) >= len(path) and parent:
+                nodes.add(parent)
+                parent = parent.rpartition("/")[0]
+        rows.extend((node, node.rpartition("/")[0], None) for node in nodes)
+        self.connection.executemany("INSERT INTO node VALUES (?, ?, ?)", rows)
+
+        # Writes below a value replace it with a node
+        if path:
+            self.connection.execute("DELETE FROM node WHERE path = ''")
+        parent = path.rpartition("/")[0]
+        while parent:
+            self.connection.execute(
+                "INSERT INTO node VALUES (?, ?, NULL) "
+                "ON CONFLICT (path) DO UPDATE SET value = NULL",
+                (parent, parent.rpartition("/")[0]),
+            )
+            parent = parent.rpartition("/")[0]
+
+    def _remove(self, path: str):
+        if not path:
+            self.connection.execute("DELETE FROM node")
+            return
+        self.connection.execute(
+            "DELETE FROM node WHERE path = ? OR (path > ? AND path < ?)",
+            (path, f"{path}/", f"{path}0"),
+        )
+
+    def _prune(self, path: str):
+        """Drop ancestors left without children, like Firebase does"""
+        parent = path.rpartition("/")[0]
+        while parent:
+            if self.connection.execute(
+                "SELECT 1 FROM node WHERE parent = ? LIMIT 1", (parent,)
+            ).fetchone():
+                break
+            deleted = self.connection.execute(
+                "DELETE FROM node WHERE path = ? AND value IS NULL", (parent,)
+            )
+            if not deleted.rowcount:
+                break
+            parent = parent.rpartition("/")[0]
+
+    def _shallow(self, path: str):
+        row = self.connection.execute(
+            "SELECT value FROM node WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None and row[0] is not None:
+            return json.loads(row[0])
+        children = self.connection.execute(
+            "SELECT path, value FROM node WHERE parent = ? AND path != ''", (path,)
+        )
+        res = {
+            child.rpartition("/")[2]: True if value is None else json.loads(value)
+            for child, value in children
+        }
+        return res or None
+
+    def _query(self, path: str, params: dict):
+        """Subset of the Firebase REST queries, ordered by key only"""
+        assert params.get("orderBy") == '"$key"', "Only orderBy=$key is supported"
+        keys = self._shallow(path)
+        if type(keys) is not dict:
+            return keys
+        keys = sorted(keys)
+        if "equalTo" in params:
+            keys = [key for key in keys if key == json.loads(params["equalTo"])]
+        if "startAt" in params:
+            keys = [key for key in keys if key >= json.loads(params["startAt"])]
+        if "endAt" in params:
+            keys = [key for key in keys if key <= json.loads(params["endAt"])]
+        if "limitToFirst" in params:
+            keys = keys[: int(params["limitToFirst"])]
+        if "limitToLast" in params:
+            keys = keys[-int(params["limitToLast"]) :]
+        return {key: self._read(self._join(path, key)) for key in keys}
+
+    def put(self, path: str, data: dict, params: dict = None) -> dict:
+        with self._lock, self.connection:
+            self.requests += 1
+            self._write(self._path(path), data)
+        if params and params.get("print") == "silent":
+            return None
+        return data
+
+    def get(self, endpoint: str, params: dict = None):
+        path = self._path(endpoint)
+        with self._lock:
+            self.requests += 1
+            if params and params.get("shallow") == "true":
+                return self._shallow(path)
+            if params and "orderBy" in params:
+                return self._query(path, params)
+            return self._read(path)
+
+    def get_shallow(self, endpoint: str):
+        return self.get(endpoint, params={"shallow": "true"})
+
+    def get_stream(self, endpoint: str, chunk_size: int = 65536):
+        """Yields the JSON document of a subtree in chunks, encoded row by row"""
+        path = self._path(endpoint)
+        parts, size = [], 0
+        # The cursor is read while streaming, writers wait until the stream is done
+        with self._lock:
+            self.requests += 1
+            for part in self._iter_json(path):
+                parts.append(part)
+                size += len(part)
+                if size >= chunk_size:
+                    yield "".join(parts).encode()
+                    parts, size = [], 0
+        yield "".join(parts).encode()
+
+    def _iter_json(self, path: str):
+        """JSON text of a subtree, encoded row by row"""
+        # Paths of the open objects and whether they already hold a member
+        stack, members = [], []
+        for row_path, value in self._iter_rows(path):
+            if row_path == path:
+                if value is not None:
+                    yield value
+                    return
+                yield "{"
+                stack.append(path)
+                members.append(False)
+                continue
+            if not stack:
+                yield "{"
+                stack.append(path)
+                members.append(False)
+            parent = row_path.rpartition("/")[0]
+            while stack[-1] != parent:
+                stack.pop()
+                members.pop()
+                yield "}"
+            if members[-1]:
+                yield ","
+            members[-1] = True
+            yield f"{json.dumps(row_path.rpartition('/')[2])}:"
+            if value is None:
+                yield "{"
+                stack.append(row_path)
+                members.append(False)
+            else:
+                yield value
+        if not stack:
+            yield "null"
+        yield "}" * len(stack)
+
+    def patch(self, path: str, data: dict) -> dict:
+        path = self._path(path)
+        with self._lock, self.connection:
+            self.requests += 1
+            for key, value in data.items():
+                self._write(self._join(path, self._path(key)), value)
+        return data
+
+    def delete(self, endpoint: str):
+        path = self._path(endpoint)
+        with self._lock, self.connection:
+            self.requests += 1
+            self._remove(path)
+            self._prune(path)
+        return None
+
+
+def get_client(base_uri: str = None):
+    """Storage client for a DB URL, "sqlite://<path>" selects the embedded backend
+
+    Args:
+        base_uri (str, optional): DB URL. Defaults to FirebaseConfig.base_uri
+
+    Returns:
+        FirebaseClient | SQLiteClient: Storage client
+    """
+    base_uri = base_uri or FirebaseConfig.base_uri
+    if base_uri.startswith("sqlite://"):
+        return SQLiteClient(base_uri[len("sqlite://") :] or ":memory:")
+    return FirebaseClient(base_uri=base_uri)
+
+
+class BlockConfig:
+    """File block storage config"""
+
+    # Root node of the block store, reserved in the namespace
+    root = "blocks"
+    block_size = 1024 * 1024
+    workers = 8
+
+
+class CacheConfig:
+    """Client-side namespace cache config"""
+
+    enabled = True
+    max_size = 4096
+    ttl = 30.0
 
 
 class FirebaseClient:
-    """Firebase Client with GET, PUT & DELETE request functionalites"""
+    """Firebase Client with GET, PUT & DELETE request functionalites over a pooled,
+    keep-alive HTTP session"""
+
+    def __init__(
+        self,
+        base_uri: str = None,
+        pool_size: int = None,
+        timeout: tuple = None,
+        retries: int = None,
+        backoff_factor: float = None,
+    ):
+        self.base_uri = base_uri or FirebaseConfig.base_uri
+        self.timeout = timeout or FirebaseConfig.timeout
+        pool_size = pool_size or FirebaseConfig.pool_size
+
+        retry = Retry(
+            total=FirebaseConfig.retries if retries is None else retries,
+            backoff_factor=(
+                FirebaseConfig.backoff_factor
+                if backoff_factor is None
+                else backoff_factor
+            ),
+            status_forcelist=FirebaseConfig.retry_status,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
 
-    def __init__(self):
-        self.base_uri = FirebaseConfig.base_uri
+    def connection_stats(self) -> dict:
+        """Connection reuse counters aggregated over all pooled hosts
 
-    def put(self, path: str, data: dict) -> dict:
+        Returns:
+            dict: Number of requests sent, connections opened and connections reused
+        """
+        pools = self._adapter.poolmanager.pools
+        stats = {"requests": 0, "connections": 0}
+        for key in pools.keys():
+            pool = pools[key]
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+        stats["reused"] = stats["requests"] - stats["connections"]
+        return stats
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+    def put(self, path: str, data: dict, params: dict = None) -> dict:
         """Sends a PUT request to Firebase DB API server to create file or directory
 
         Args:
             path (str): File or directory path
             data (dict): Metadata for file or directory
+            params (dict, optional): Query parameters, `print=silent` skips the echo
 
         Returns:
-            dict: Request Feedback as JSON Response
+            dict: Request Feedback as JSON Response, None for a silent write
         """
-        res = requests.put(
+        res = self.session.put(
             f"{self.base_uri}{path}.json",
             data=json.dumps(data),
+            params=params,
+            timeout=self.timeout,
         )
+        if res.status_code == 204:
+            return None
         return res.json()
 
-    def get(self, endpoint: str):
+    def get(self, endpoint: str, params: dict = None):
         """Sends a GET request to Firebase Realtime DB to get list of files and directories
         and to find if a file or directory exists or not
 
         Args:
             endpoint (str): File or folder path
+            params (dict, optional): Query parameters. Eg: {"shallow": "true"}
 
         Returns:
             dict: Request Feedback as JSON Response
         """
-        res = requests.get(f"{self.base_uri}{endpoint}")
+        res = self.session.get(
+            f"{self.base_uri}{endpoint}", params=params, timeout=self.timeout
+        )
         return res.json()
 
+    def get_shallow(self, endpoint: str):
+        """Sends a shallow GET request, child nodes are returned as `true` instead of
+        their whole subtree
+
+        Args:
+            endpoint (str): File or folder path
+
+        Returns:
+            dict: Top level keys of the node
+        """
+        return self.get(endpoint, params={"shallow": "true"})
+
     def delete(self, endpoint: str):
         """Sends a DELETE request to Firebase Realtime DB server to delete a file or directory
 
@@ -55,27 +433,183 @@ class FirebaseClient:
         Returns:
             dict: Request Feedback as JSON Response
         """
-        res = requests.delete(f"{self.base_uri}{endpoint}")
+        res = self.session.delete(f"{self.base_uri}{endpoint}", timeout=self.timeout)
         return res.json()
 
+    def get_stream(self, endpoint: str, chunk_size: int = 65536):
+        """Sends a GET request and yields the raw response body in chunks instead of
+        decoding it as a whole
 
-class HDFSEmulator(FirebaseClient):
-    """Emulate the file system structure of HDFS using Firebase and allow the export of its
-    structure in the XML format.
+        Args:
+            endpoint (str): File or folder path
+            chunk_size (int, optional): Bytes per chunk. Defaults to 65536.
 
-    Args:
-        FirebaseClient (class): Firebase API Client
+        Yields:
+            bytes: Response body chunk
+        """
+        with self.session.get(
+            f"{self.base_uri}{endpoint}", stream=True, timeout=self.timeout
+        ) as res:
+            yield from res.iter_content(chunk_size=chunk_size)
+
+    def patch(self, path: str, data: dict) -> dict:
+        """Sends a PATCH request to Firebase DB API server to update multiple children of a
+        node in one request. Keys may be relative paths, `None` values delete the child.
+
+        Args:
+            path (str): Parent node path
+            data (dict): Relative child path to value
+
+        Returns:
+            dict: Request Feedback as JSON Response
+        """
+        res = self.session.patch(
+            f"{self.base_uri}{path}.json",
+            data=json.dumps(data),
+            timeout=self.timeout,
+        )
+        return res.json()
+
+
+class NamespaceCache:
+    """LRU cache of namespace nodes keyed by path with a time-to-live. Each entry holds
+    the top level keys of a node, or `None` if the node does not exist."""
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = None, ttl: float = None, enabled: bool = None):
+        self.max_size = CacheConfig.max_size if max_size is None else max_size
+        self.ttl = CacheConfig.ttl if ttl is None else ttl
+        self.enabled = CacheConfig.enabled if enabled is None else enabled
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        path = path[: -len(".json")] if path.endswith(".json") else path
+        return path.rstrip("/")
+
+    def get(self, path: str):
+        """Lookup a cached node, returns `NamespaceCache._MISSING` if not cached"""
+        key = self._key(path)
+        entry = self._lookup(key)
+        if entry is None:
+            # A fresh parent listing without this child proves it does not exist
+            parent, _, child = key.rpartition("/")
+            parent_entry = self._lookup(parent) if key else None
+            if parent_entry is not None and type(parent_entry[1]) is tuple:
+                if child not in parent_entry[1]:
+                    self.hits += 1
+                    return None
+            self.misses += 1
+            return self._MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key) if self.enabled else None
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def set(self, path: str, node):
+        """Cache a node's top level keys, or `None` for a missing node"""
+        if not self.enabled or self.max_size <= 0:
+            return
+        if type(node) is dict:
+            node = tuple(node.keys())
+        key = self._key(path)
+        self._entries[key] = (time.monotonic() + self.ttl, node)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, path: str):
+        """Drop a node and all of its descendants from the cache"""
+        key = self._key(path)
+        prefix = f"{key}/"
+        for cached in [k for k in self._entries if k == key or k.startswith(prefix)]:
+            del self._entries[cached]
+
+    def on_put(self, path: str, data):
+        """Write-through update after a node was written"""
+        self.invalidate(path)
+        self.set(path, data)
+        self._update_parent(path, add=True)
+
+    def on_patch(self, path: str, data: dict):
+        """Write-through update after a multi-location update"""
+        path = self._key(path)
+        for key, value in data.items():
+            if value is None:
+                self.on_delete(f"{path}/{key}")
+            else:
+                self.on_put(f"{path}/{key}", value)
+
+    def on_delete(self, path: str):
+        """Write-through update after a node was deleted"""
+        self.invalidate(path)
+        self.set(path, None)
+        self._update_parent(path, add=False)
+
+    def _update_parent(self, path: str, add: bool):
+        key = self._key(path)
+        parent, _, child = key.rpartition("/")
+        entry = self._entries.get(parent)
+        if entry is None:
+            return
+        keys = entry[1]
+        if type(keys) is not tuple:
+            # Parent was missing (or a value), writes create it implicitly
+            self.invalidate(parent)
+        elif add and child not in keys:
+            self._entries[parent] = (entry[0], keys + (child,))
+        elif not add and child in keys:
+            self._entries[parent] = (entry[0], tuple(k for k in keys if k != child))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class HDFSEmulator:
+    """Emulate the file system structure of HDFS using Firebase and allow the export of its
+    structure in the XML format. The storage backend is chosen by the DB URL, see
+    `get_client`.
     """
 
-    def __init__(self, command: str, action_item: str):
+    def __init__(
+        self,
+        command: str,
+        action_item: str,
+        base_uri: str = None,
+        cache: bool = None,
+        options: list = None,
+    ):
         """Initialise the HDFS file system emulator with command and arguments
 
         Args:
             command (str): Input command
             action_item (str): Path
+            base_uri (str, optional): DB URL. Defaults to FirebaseConfig.base_uri
+            cache (bool, optional): Use the namespace cache. Defaults to CacheConfig.enabled
+            options (list, optional): Command options between command and path
         """
         self.command = command
         self.action_item = action_item
+        self.options = options or []
         self._metadata_vars = ["type", "id"]
 
         self._verify_input_command()
@@ -84,33 +618,123 @@ class HDFSEmulator(FirebaseClient):
             "-ls": self.ls,
             "-mkdir": self.mkdir,
             "-rmdir": self.rmdir,
+            "-rmr": self.rmr,
             "-create": self.create,
             "-rm": self.rm,
             "-export": self.export,
+            "-batch": self.batch,
+            "-put": self.put_file,
+            "-cat": self.cat,
         }
 
-        super().__init__()
+        self.cache = NamespaceCache(enabled=cache)
+        # Writes held back in batch mode, path to node data
+        self._pending = None
+
+        self.client = get_client(base_uri)
+
+    def get(self, endpoint: str, params: dict = None):
+        return self.client.get(endpoint, params=params)
+
+    def get_shallow(self, endpoint: str):
+        return self.client.get_shallow(endpoint)
+
+    def get_stream(self, endpoint: str, chunk_size: int = 65536):
+        return self.client.get_stream(endpoint, chunk_size=chunk_size)
+
+    def put(self, path: str, data: dict) -> dict:
+        if self._pending is not None:
+            self._pending[NamespaceCache._key(path)] = data
+            self.cache.on_put(path, data)
+            return data
+        res = self.client.put(path, data)
+        self.cache.on_put(path, data)
+        return res
+
+    def patch(self, path: str, data: dict) -> dict:
+        res = self.client.patch(path, data)
+        self.cache.on_patch(path, data)
+        return res
+
+    def delete(self, endpoint: str):
+        res = self.client.delete(endpoint)
+        self.cache.on_delete(endpoint)
+        return res
+
+    def connection_stats(self) -> dict:
+        return self.client.connection_stats()
+
+    def close(self):
+        self.client.close()
+
+    def cache_stats(self) -> dict:
+        """Namespace cache hit/miss counters"""
+        return self.cache.stats()
 
     def _verify_input_command(self):
         """Verify the format of input command"""
         assert self.command.startswith("-"), "Command must start with -"
 
+    def _pending_keys(self, path: str):
+        """Top level keys of a node written in the current batch, `None` for nodes below
+        a newly written node, else `NamespaceCache._MISSING`"""
+        if not self._pending:
+            return NamespaceCache._MISSING
+        key = NamespaceCache._key(path)
+        if key in self._pending:
+            prefix = f"{key}/"
+            children = [
+                pending[len(prefix) :]
+                for pending in self._pending
+                if pending.startswith(prefix) and "/" not in pending[len(prefix) :]
+            ]
+            return tuple(self._pending[key].keys()) + tuple(children)
+        parent = key.rpartition("/")[0]
+        while parent:
+            if parent in self._pending:
+                return None
+            parent = parent.rpartition("/")[0]
+        return NamespaceCache._MISSING
+
+    def _node_keys(self, path: str):
+        """Top level keys of a node, answered from the namespace cache when warm"""
+        keys = self._pending_keys(path)
+        if keys is NamespaceCache._MISSING:
+            keys = self.cache.get(path)
+        if keys is NamespaceCache._MISSING:
+            keys = self.get_shallow(f"{path}.json")
+            self.cache.set(path, keys)
+            if type(keys) is dict:
+                keys = tuple(keys.keys())
+        return keys
+
     def _dir_exists(self, path: str) -> bool:
         """Checks if the directory exists."""
-        if self.get(f"{path}.json"):
+        if self._node_keys(path):
             return True
         return False
 
     def _file_exists(self, path: str) -> bool:
         """Checks if the file exists."""
         file_endpoint = path.split(".")[0]
-        if self.get(f"{file_endpoint}.json"):
+        keys = self._pending_keys(file_endpoint)
+        if keys is NamespaceCache._MISSING:
+            keys = self.cache.get(file_endpoint)
+        if keys is NamespaceCache._MISSING:
+            # Probe the `id` field only so the file content is not downloaded
+            keys = self.get(
+                f"{file_endpoint}.json",
+                params={"orderBy": '"$key"', "equalTo": '"id"', "limitToFirst": 1},
+            )
+            if not keys:
+                self.cache.set(file_endpoint, None)
+        if keys:
             return True
         return False
 
     def _is_dir_empty(self, path: str) -> bool:
         """Checks if the folder is empty."""
-        if len(self.get(f"{path}.json").keys()) > 3:
+        if len(self._node_keys(path)) > 3:
             return False
         return True
 
@@ -118,6 +742,16 @@ class HDFSEmulator(FirebaseClient):
         """Get the parent directory"""
         return "/".join(path.split("/")[:-1])
 
+    def _is_reserved(self, path: str) -> bool:
+        """Checks if the path is inside the block store"""
+        return path.strip("/").split("/")[0] == BlockConfig.root
+
+    @staticmethod
+    def _file_endpoint(path: str) -> str:
+        """Node a file is written to, names without a directory live in the root"""
+        path = f"/{path}" if "/" not in path else path
+        return path.split(".")[0]
+
     def top_level_parser(self, json_doc: dict) -> list:
         """Parses files and directories at depth level of 1
 
@@ -162,14 +796,40 @@ class HDFSEmulator(FirebaseClient):
             path (str): Directory or file path
         """
         try:
-            if path == "/":
-                res = self.get("/.json")
-            else:
-                res = self.get(f"{path}.json")
+            res = self._list_dir("" if path == "/" else path)
             print("\t\t".join(self.top_level_parser(res)))
         except Exception as e:
             print("Invalid Path:", path)
 
+    def _list_dir(self, path: str) -> dict:
+        """Fetch the metadata of the children of a directory with shallow queries,
+        without downloading the subtrees below them
+
+        Args:
+            path (str): Directory path, "" for root
+
+        Returns:
+            dict: Child key to shallow child node
+        """
+        res = self.get_shallow(f"{path}/.json" if path == "" else f"{path}.json")
+        self.cache.set(path, res)
+        if type(res) is not dict:
+            return res
+        children = [
+            key
+            for key, value in res.items()
+            if value is True and not (path == "" and key == BlockConfig.root)
+        ]
+        with ThreadPoolExecutor(max_workers=FirebaseConfig.pool_size) as executor:
+            nodes = list(
+                executor.map(
+                    lambda key: self.get_shallow(f"{path}/{key}.json"), children
+                )
+            )
+        for key, node in zip(children, nodes):
+            self.cache.set(f"{path}/{key}", node)
+        return dict(zip(children, nodes))
+
     def mkdir(self, path: str):
         """Create a new directory only if parent directory exists. This function will also
         check for user directory, if not found it will create one for the user.
@@ -179,6 +839,11 @@ class HDFSEmulator(FirebaseClient):
         """
         try:
             assert path.startswith("/"), "Path must start with /"
+            assert not self._is_reserved(path), f"Reserved path: {path}"
+
+            if "-p" in self.options:
+                asyncio.run(AsyncHDFSEmulator(self).mkdir_p(path))
+                return
 
             user_dir = "/".join(path.split("/")[:2])
             # Check and create user directory
@@ -219,14 +884,95 @@ class HDFSEmulator(FirebaseClient):
             path (str): Directory Path
         """
         try:
+            assert not self._is_reserved(path), f"Reserved path: {path}"
             if self._is_dir_empty(path):
                 self.delete(f"{path}.json")
                 print(f"Successfully deleted directory: {path}")
             else:
                 print(f"Directory is not empty: {path}")
+        except AssertionError as e:
+            print(f"Error: {e}")
         except Exception as e:
             print(f"Invalid path: {path}")
 
+    def rmr(self, path: str, workers: int = None, batch_size: int = 500):
+        """Remove a directory and everything below it. The subtree is walked once with
+        shallow listings and then deleted bottom-up, level by level, with multi-location
+        PATCH-to-null requests sent through a bounded thread pool. Pass the `-dryrun`
+        option to only list what would be deleted.
+
+        Args:
+            path (str): Directory Path
+            workers (int, optional): Concurrent requests. Defaults to FirebaseConfig.pool_size
+            batch_size (int, optional): Nodes deleted per request. Defaults to 500.
+        """
+        try:
+            assert path.startswith("/") and path != "/", "Path must start with /"
+            assert not self._is_reserved(path), f"Reserved path: {path}"
+            if not self._dir_exists(path):
+                print(f"Invalid path: {path}")
+                return
+            workers = workers or FirebaseConfig.pool_size
+            dry_run = "-dryrun" in self.options
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Walk the subtree one level at a time, one shallow GET per node
+                levels, level, files, blocks = [], [path], 0, []
+                while level:
+                    nodes = executor.map(
+                        lambda p: (p, self.get_shallow(f"{p}.json")), level
+                    )
+                    levels.append(level)
+                    level = []
+                    for node_path, node in nodes:
+                        if type(node) is not dict:
+                            continue
+                        files += node.get("type") == "FILE"
+                        if node.get("blocks"):
+                            blocks.extend(node["blocks"].split(","))
+                        if dry_run:
+                            print(f"Would delete {node.get('type', '')}: {node_path}")
+                        level.extend(
+                            f"{node_path}/{key}"
+                            for key, value in node.items()
+                            if value is True
+                        )
+                total = sum(len(level) for level in levels)
+                if dry_run:
+                    print(
+                        f"Would delete {total - files} directories, {files} files, "
+                        f"{len(blocks)} blocks"
+                    )
+                    return
+
+                # Delete deepest levels first so an interrupted run leaves a tree
+                deleted = 0
+                if blocks:
+                    self._delete_blocks(blocks, executor, batch_size)
+                for level in reversed(levels[1:]):
+                    batches = [
+                        level[i : i + batch_size]
+                        for i in range(0, len(level), batch_size)
+                    ]
+                    futures = {
+                        executor.submit(
+                            self.client.patch,
+                            path,
+                            {p[len(path) + 1 :]: None for p in batch},
+                        ): len(batch)
+                        for batch in batches
+                    }
+                    for future in as_completed(futures):
+                        future.result()
+                        deleted += futures[future]
+                        print(f"Deleted {deleted}/{total} nodes")
+            self.delete(f"{path}.json")
+            print(
+                f"Successfully deleted {total - files} directories, {files} files: {path}"
+            )
+        except Exception as e:
+            print(f"Error: {e}")
+
     def create(self, path: str):
         """Create/Write to new file
 
@@ -234,10 +980,12 @@ class HDFSEmulator(FirebaseClient):
             path (str): File path
         """
         try:
+            file_endpoint = self._file_endpoint(path)
+            assert not self._is_reserved(file_endpoint), f"Reserved path: {path}"
             if "/" not in path:
                 if not self._file_exists(f"/{path}"):
                     self.put(
-                        f"/{path.split('.')[0]}",
+                        file_endpoint,
                         data={
                             "type": "FILE",
                             "name": path.split("/")[-1],
@@ -249,7 +997,7 @@ class HDFSEmulator(FirebaseClient):
             elif self._dir_exists(self._get_parent_dir(path)):
                 if not self._file_exists(path):
                     self.put(
-                        path.split(".")[0],
+                        file_endpoint,
                         data={
                             "type": "FILE",
                             "name": path.split("/")[-1],
@@ -272,13 +1020,156 @@ class HDFSEmulator(FirebaseClient):
             path (str): File Path
         """
         path = f"/{path}" if "/" not in path else path
-        file_endpoint = path.split(".")[0]
+        file_endpoint = self._file_endpoint(path)
+        try:
+            assert not self._is_reserved(file_endpoint), f"Reserved path: {path}"
+        except AssertionError as e:
+            print(f"Error: {e}")
+            return
         if self._file_exists(path):
+            node = self.get_shallow(f"{file_endpoint}.json")
+            if type(node) is dict and node.get("blocks"):
+                self._delete_blocks(node["blocks"].split(","))
             self.delete(f"{file_endpoint}.json")
             print(f"Successfully deleted file: {path}")
         else:
             print(f"Invalid Path: {path}")
 
+    def _delete_blocks(self, blocks: list, executor=None, batch_size: int = 500):
+        """Delete blocks from the block store with multi-location PATCH-to-null requests"""
+        batches = [
+            {block: None for block in blocks[i : i + batch_size]}
+            for i in range(0, len(blocks), batch_size)
+        ]
+        if executor is None:
+            for batch in batches:
+                self.client.patch(f"/{BlockConfig.root}", batch)
+            return
+        futures = [
+            executor.submit(self.client.patch, f"/{BlockConfig.root}", batch)
+            for batch in batches
+        ]
+        for future in futures:
+            future.result()
+
+    def put_file(self, path: str):
+        """Upload a local file, given as option before the path, as fixed size blocks.
+        The file is read and uploaded one block at a time with at most
+        `BlockConfig.workers` blocks in flight, its metadata node only lists the blocks.
+
+        Args:
+            path (str): File path
+        """
+        try:
+            assert self.options, "Usage: -put <local-file> <path>"
+            assert path.startswith("/"), "Path must start with /"
+            file_endpoint = self._file_endpoint(path)
+            assert not self._is_reserved(file_endpoint), f"Reserved path: {path}"
+            local_path = self.options[-1]
+            if not self._dir_exists(self._get_parent_dir(path)):
+                print(f"Invalid Path: {path}")
+                return
+            if self._file_exists(path):
+                print(f"File already exists: {path}")
+                return
+
+            blocks, size = [], 0
+            in_flight = threading.BoundedSemaphore(BlockConfig.workers)
+            with ThreadPoolExecutor(max_workers=BlockConfig.workers) as executor:
+                pending = set()
+                try:
+                    with open(local_path, "rb") as f:
+                        while True:
+                            in_flight.acquire()
+                            # Only unfinished uploads are kept, failures surface early
+                            for future in [done for done in pending if done.done()]:
+                                pending.discard(future)
+                                future.result()
+                            data = f.read(BlockConfig.block_size)
+                            if not data:
+                                in_flight.release()
+                                break
+                            block = uuid.uuid4().hex
+                            blocks.append(block)
+                            size += len(data)
+                            future = executor.submit(
+                                self.client.put,
+                                f"/{BlockConfig.root}/{block}",
+                                base64.b64encode(data).decode(),
+                                params={"print": "silent"},
+                            )
+                            future.add_done_callback(lambda _: in_flight.release())
+                            pending.add(future)
+                    for future in pending:
+                        future.result()
+                except BaseException:
+                    # Do not leave orphaned blocks behind
+                    for future in pending:
+                        future.cancel()
+                    wait(pending)
+                    if blocks:
+                        self._delete_blocks(blocks)
+                    raise
+
+            self.put(
+                file_endpoint,
+                data={
+                    "type": "FILE",
+                    "name": path.split("/")[-1],
+                    "id": uuid.uuid4().hex,
+                    "size": size,
+                    "blockSize": BlockConfig.block_size,
+                    "blocks": ",".join(blocks),
+                },
+            )
+            print(f"Successfully uploaded {size} bytes in {len(blocks)} blocks: {path}")
+        except Exception as e:
+            print(f"Error: {e}")
+
+    def cat(self, path: str):
+        """Write the content of a file to stdout. Blocks are downloaded in parallel with
+        at most `BlockConfig.workers` blocks in flight and written in order.
+
+        Args:
+            path (str): File path
+        """
+        try:
+            path = f"/{path}" if "/" not in path else path
+            node = self.get_shallow(f"{path.split('.')[0]}.json")
+            if type(node) is not dict or node.get("type") != "FILE":
+                print(f"Invalid Path: {path}")
+                return
+            if "blocks" not in node:
+                # Files written by -create keep their content inline
+                print(node.get("content", ""))
+                return
+
+            out = getattr(sys.stdout, "buffer", None)
+            if out is None:
+                # Captured output, eg: under -batch, only takes text
+                out = _TextSink(sys.stdout)
+            blocks = [block for block in node["blocks"].split(",") if block]
+            with ThreadPoolExecutor(max_workers=BlockConfig.workers) as executor:
+                window = deque()
+                for block in blocks:
+                    window.append(
+                        executor.submit(
+                            self.client.get, f"/{BlockConfig.root}/{block}.json"
+                        )
+                    )
+                    if len(window) >= BlockConfig.workers:
+                        out.write(self._decode_block(window.popleft().result()))
+                while window:
+                    out.write(self._decode_block(window.popleft().result()))
+            out.flush()
+        except Exception as e:
+            print(f"Error: {e}")
+
+    @staticmethod
+    def _decode_block(data) -> bytes:
+        assert type(data) is str, "Missing block"
+        return base64.b64decode(data)
+
     def export(self, output_path: str = "fs_output.xml"):
         """Export the file system skeleton after parsing as XML file
 
@@ -287,20 +1178,129 @@ class HDFSEmulator(FirebaseClient):
         """
         assert ".xml" in output_path, "Can only write to xml files"
         try:
-            res = self.fs_parser(self.get("/.json"))
-            res = dict2xml({"root": res})
-            # Drop extra lines
-            res = [line for line in res.split("\n") if line.strip() != ""]
-            # Drop duplicate tags for files
-            res = [line for line in res if not all([x in line for x in ["</", "/>"]])]
-            res = "\n".join(res)
-
-            with open(output_path, "w") as f:
-                f.write(res)
+            # Stream the namespace straight into the file, only the path from the root
+            # to the current node is held in memory
+            events = self._iter_namespace_events()
+            with open(f"{output_path}.part", "w") as f:
+                for i, line in enumerate(iter_fs_xml(events)):
+                    f.write(f"\n{line}" if i else line)
+            os.replace(f"{output_path}.part", output_path)
             print("Successfully exported file structure to: " + output_path)
         except Exception as e:
             print(f"Error: {e}")
 
+    def _iter_namespace_events(self):
+        """JSON events of the whole namespace, streamed one top level node at a time so
+        the block store is never downloaded"""
+        yield "start_map", None
+        top_level = self.get_shallow("/.json")
+        for key, value in (top_level or {}).items():
+            if value is not True or key == BlockConfig.root:
+                continue
+            yield "map_key", key
+            yield from iter_json_events(self.get_stream(f"/{key}.json"))
+        yield "end_map", None
+
+    def flush(self):
+        """Send the writes held back in batch mode as one multi-location PATCH of their
+        common parent node"""
+        pending, self._pending = self._pending, None
+        if not pending:
+            return
+        # Nest written nodes into written ancestors, a multi-location update may not
+        # contain a path and its descendant
+        updates = {}
+        for path in sorted(pending, key=lambda p: p.count("/")):
+            parent, node = path, None
+            while parent and node is None:
+                parent = parent.rpartition("/")[0]
+                node = updates.get(parent)
+            if node is None:
+                updates[path] = dict(pending[path])
+                continue
+            for key in path[len(parent) + 1 :].split("/")[:-1]:
+                node = node.setdefault(key, {})
+            node[path.rpartition("/")[2]] = dict(pending[path])
+            updates[path] = node[path.rpartition("/")[2]]
+
+        top_level = [path for path in updates if path.rpartition("/")[0] not in pending]
+        common = "/".join(
+            os.path.commonprefix([p.rpartition("/")[0].split("/") for p in top_level])
+        )
+        data = {path[len(common) + 1 :]: updates[path] for path in top_level}
+        try:
+            self.patch(common or "/", data)
+        except Exception:
+            # The cache was written through with writes that never landed
+            self.cache.clear()
+            raise
+
+    def batch(self, source: str, batch_size: int = 500):
+        """Run many commands in this process over one pooled connection. Consecutive
+        `-mkdir` and `-create` commands are grouped and sent as one multi-location PATCH.
+
+        Args:
+            source (str): File with one "<command> <action-item>" per line, "-" for stdin
+            batch_size (int, optional): Max writes per PATCH. Defaults to 500.
+        """
+        groupable = ("-mkdir", "-create")
+        f = sys.stdin if source == "-" else open(source)
+        start = time.perf_counter()
+        count, group = 0, []
+        try:
+            for lineno, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                tokens = line.split()
+                if len(tokens) < 2:
+                    # Reported in order, after the writes grouped before it
+                    self._flush_group(group)
+                    print(f"[{lineno}] {line} -> Error: expected <command> <item>")
+                    count += 1
+                    continue
+                command, *options, action_item = tokens
+                grouped = command in groupable and not options
+                if not grouped or len(self._pending or ()) >= batch_size:
+                    self._flush_group(group)
+                if grouped and self._pending is None:
+                    self._pending = {}
+                self.command, self.action_item = command, action_item
+                self.options = options
+                with contextlib.redirect_stdout(io.StringIO()) as out:
+                    self.execute()
+                result = (lineno, line, out.getvalue().strip().replace("\n", "; "))
+                if self._pending is not None:
+                    group.append(result)
+                else:
+                    print("[%d] %s -> %s" % result)
+                count += 1
+        finally:
+            # Writes still held back are sent even if reading the commands failed
+            self._flush_group(group)
+            if f is not sys.stdin:
+                f.close()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"Executed {count} commands in {elapsed:.3f}s "
+            f"({count / elapsed if elapsed else 0:.1f} commands/s, "
+            f"{self.connection_stats()['requests']} requests)"
+        )
+
+    def _flush_group(self, group: list):
+        """Flush pending batch writes and report the commands that produced them"""
+        try:
+            self.flush()
+            error = None
+        except Exception as e:
+            error = e
+        for lineno, line, message in group:
+            if error is not None:
+                message = f"Error: batch write failed, {error}"
+            print(f"[{lineno}] {line} -> {message}")
+        group.clear()
+
     def execute(self):
         """Execute the input command"""
         try:
@@ -315,6 +1315,306 @@ class HDFSEmulator(FirebaseClient):
             )
 
 
+class AsyncFirebaseClient:
+    """asyncio client with the GET, PUT, PATCH & DELETE surface of `FirebaseClient`.
+    Requests run on worker threads over the pooled session of a `FirebaseClient` (or
+    any storage client from `get_client`), at most `concurrency` of them at a time."""
+
+    def __init__(self, client=None, concurrency: int = None):
+        self.client = client or get_client()
+        self.concurrency = concurrency or FirebaseConfig.pool_size
+        self._semaphore = None
+
+    async def _request(self, method, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await asyncio.to_thread(method, *args)
+
+    async def put(self, path: str, data: dict) -> dict:
+        return await self._request(self.client.put, path, data)
+
+    async def get(self, endpoint: str, params: dict = None):
+        return await self._request(self.client.get, endpoint, params)
+
+    async def get_shallow(self, endpoint: str):
+        return await self.get(endpoint, params={"shallow": "true"})
+
+    async def patch(self, path: str, data: dict) -> dict:
+        return await self._request(self.client.patch, path, data)
+
+    async def delete(self, endpoint: str):
+        return await self._request(self.client.delete, endpoint)
+
+
+class AsyncHDFSEmulator:
+    """asyncio facade over an `HDFSEmulator` for high fan-out namespace operations. Shares
+    the emulator's session and namespace cache, the cache is only touched from the event
+    loop thread."""
+
+    def __init__(self, fs: HDFSEmulator, concurrency: int = None):
+        self.fs = fs
+        self.client = AsyncFirebaseClient(fs.client, concurrency=concurrency)
+
+    async def node_keys(self, path: str):
+        """Top level keys of a node, answered from the namespace cache when warm"""
+        keys = self.fs.cache.get(path)
+        if keys is NamespaceCache._MISSING:
+            keys = await self.client.get_shallow(f"{path}.json")
+            self.fs.cache.set(path, keys)
+        return keys
+
+    async def exists_many(self, paths: list) -> list:
+        """Check the existence of many nodes concurrently
+
+        Args:
+            paths (list): Node paths
+
+        Returns:
+            list: Existence flag per path
+        """
+        nodes = await asyncio.gather(*(self.node_keys(path) for path in paths))
+        return [bool(node) for node in nodes]
+
+    async def mkdir_p(self, path: str):
+        """Create a directory and all of its missing ancestors. The existence of the
+        ancestors is resolved concurrently and the missing ones are written with one
+        multi-location PATCH.
+
+        Args:
+            path (str): Directory Path
+        """
+        segments = [segment for segment in path.split("/") if segment]
+        paths = ["/" + "/".join(segments[: i + 1]) for i in range(len(segments))]
+        exists = await self.exists_many(paths)
+        if all(exists):
+            print(f"Directory already exists: {path}")
+            return
+
+        missing = exists.index(False)
+        parent = paths[missing - 1] if missing else "/"
+        node = root = {}
+        for segment in segments[missing:]:
+            node[segment] = {"type": "DIR", "name": segment, "id": uuid.uuid4().hex}
+            node = node[segment]
+        await self.client.patch(parent, root)
+        self.fs.cache.on_patch(parent, root)
+        for created in paths[missing:]:
+            print(f"Successfully created directory: {created}")
+
+    async def create_many(self, paths: list):
+        """Create many files, the parent and file existence checks and the writes are
+        each sent concurrently
+
+        Args:
+            paths (list): File paths
+        """
+        parents = sorted({self.fs._get_parent_dir(path) for path in paths})
+        parent_exists = dict(zip(parents, await self.exists_many(parents)))
+        files = [path.split(".")[0] for path in paths]
+        file_exists = await self.exists_many(files)
+
+        writes, written = [], set()
+        for path, endpoint, exists in zip(paths, files, file_exists):
+            if self.fs._is_reserved(endpoint):
+                print(f"Error: Reserved path: {path}")
+            elif not parent_exists[self.fs._get_parent_dir(path)]:
+                print(f"Invalid Path: {path}")
+            elif exists or endpoint in written:
+                print(f"File already exists: {path}")
+            else:
+                data = {
+                    "type": "FILE",
+                    "name": path.split("/")[-1],
+                    "id": uuid.uuid4().hex,
+                    "content": "hello world",
+                }
+                writes.append((path, endpoint, data))
+                written.add(endpoint)
+
+        await asyncio.gather(
+            *(self.client.put(endpoint, data) for _, endpoint, data in writes)
+        )
+        for path, endpoint, data in writes:
+            self.fs.cache.on_put(endpoint, data)
+            print(f"Successfully created file: {path}")
+
+
+class _TextSink:
+    """Byte writer over a text stream, decoding UTF-8 across write boundaries"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def write(self, data: bytes):
+        self.stream.write(self.decoder.decode(data))
+
+    def flush(self):
+        self.stream.write(self.decoder.decode(b"", final=True))
+        self.stream.flush()
+
+
+_JSON_WHITESPACE = re.compile(r"[\s,:]*")
+_JSON_SCALAR = re.compile(r"-?\d+(\.\d+)?([eE][-+]?\d+)?|true|false|null")
+_JSON_DELIMITERS = (",", "}", "]", " ", "\t", "\n", "\r")
+
+
+def iter_json_events(chunks):
+    """Incrementally parse a JSON document into a flat stream of events without building
+    the document in memory or recursing on nesting depth
+
+    Args:
+        chunks (iterable): Raw JSON document in byte chunks
+
+    Yields:
+        tuple: (event, value) with events "start_map", "map_key", "end_map",
+            "start_array", "end_array" and "value"
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    stack = []
+    expect_key = False
+    buf = ""
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buf += decoder.decode(b"" if final else chunk, final=final)
+        pos = 0
+        while True:
+            pos = _JSON_WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+            if char == "{" or char == "[":
+                stack.append(char)
+                expect_key = char == "{"
+                yield ("start_map" if char == "{" else "start_array"), None
+                pos += 1
+                continue
+            if char == "}" or char == "]":
+                stack.pop()
+                yield ("end_map" if char == "}" else "end_array"), None
+                pos += 1
+            elif char == '"':
+                try:
+                    value, end = json.decoder.scanstring(buf, pos + 1)
+                except ValueError:
+                    if final:
+                        raise
+                    break
+                pos = end
+                if expect_key:
+                    expect_key = False
+                    yield "map_key", value
+                    continue
+                yield "value", value
+            else:
+                match = _JSON_SCALAR.match(buf, pos)
+                complete = match is not None and (
+                    final or buf[match.end() : match.end() + 1] in _JSON_DELIMITERS
+                )
+                if not complete:
+                    if final or len(buf) - pos > 64:
+                        raise ValueError(f"Invalid JSON at: {buf[pos:pos + 20]!r}")
+                    break
+                pos = match.end()
+                yield "value", json.loads(match.group())
+            # A value was completed, the next string in a map is a key
+            expect_key = bool(stack) and stack[-1] == "{"
+        buf = buf[pos:]
+
+
+def iter_fs_xml(events, root_tag: str = "root"):
+    """Walk the JSON events of the namespace and yield the lines of its XML skeleton,
+    directories as nested tags and files as self closing tags
+
+    Args:
+        events (iterable): Events from `iter_json_events`
+        root_tag (str, optional): Tag wrapping the namespace. Defaults to "root".
+
+    Yields:
+        str: XML line
+    """
+    yield f"<{root_tag}>"
+    # Frame per open map: [tag, depth, opened, metadata], None for skipped values
+    stack = []
+    key = None
+    for event, value in events:
+        if event == "map_key":
+            key = value
+        elif event == "start_map":
+            parent = stack[-1] if stack else None
+            if not stack:
+                stack.append([root_tag, 0, True, {}])
+            elif parent is None:
+                stack.append(None)
+            else:
+                if not parent[2]:
+                    # Only directories have child nodes
+                    parent[0] = parent[3].get("name", parent[0])
+                    parent[2] = True
+                    yield "\t" * parent[1] + f"<{parent[0]}>"
+                stack.append([key, parent[1] + 1, False, {}])
+        elif event == "end_map":
+            frame = stack.pop()
+            if frame is None or frame[1] == 0:
+                continue
+            padding = "\t" * frame[1]
+            if frame[2]:
+                yield f"{padding}</{frame[0]}>"
+                continue
+            name = frame[3].get("name", frame[0])
+            if frame[3].get("type") == "DIR":
+                yield f"{padding}<{name}>"
+                yield f"{padding}</{name}>"
+            elif frame[3].get("type") == "FILE":
+                yield f"{padding}<{name}/>"
+        elif event == "start_array":
+            stack.append(None)
+        elif event == "end_array":
+            stack.pop()
+        elif stack and stack[-1] is not None and key in ("type", "name"):
+            stack[-1][3][key] = value
+    yield f"</{root_tag}>"
+
+
+def fs2xml(obj: dict, out=None, root_tag: str = "root"):
+    """Converts the file system JSON response to its XML skeleton in a single iterative
+    pass, replacing `fs_parser` + `dict2xml` and the clean up of their output. For a
+    namespace already in memory, `export` streams through `iter_fs_xml` instead and
+    writes the same lines
+
+    Args:
+        obj (dict): File system JSON response
+        out (file, optional): Text buffer or file to write to. Defaults to a new buffer.
+        root_tag (str, optional): Tag wrapping the namespace. Defaults to "root".
+
+    Returns:
+        str: XML string if no `out` was given
+    """
+    buffer = io.StringIO() if out is None else out
+    write = buffer.write
+    write(f"<{root_tag}>")
+    # Frame per open directory: (children iterator, depth, tag)
+    stack = [(iter(obj.values() if type(obj) is dict else ()), 1, root_tag)]
+    while stack:
+        children, depth, tag = stack[-1]
+        padding = "\t" * depth
+        for node in children:
+            if type(node) is not dict:
+                continue
+            if node.get("type") == "FILE":
+                write(f"\n{padding}<{node['name']}/>")
+            elif node.get("type") == "DIR":
+                write(f"\n{padding}<{node['name']}>")
+                stack.append((iter(node.values()), depth + 1, node["name"]))
+                break
+        else:
+            stack.pop()
+            write(f"\n{padding[:-1]}</{tag}>")
+    if out is None:
+        return buffer.getvalue()
+
+
 def dict2xml(obj: dict, line_padding: str = "") -> str:
     """Converts a dictionary to a XML string
 
@@ -353,20 +1653,27 @@ def parse_args(line: list[str]) -> dict:
     Returns:
         dict: Arguments dictionary
     """
-    args = {"file": line[0], "command": line[1], "action_item": line[2]}
+    args = {
+        "file": line[0],
+        "command": line[1],
+        "action_item": line[-1],
+        "options": line[2:-1],
+    }
     return args
 
 
 if __name__ == "__main__":
     """To run the file execute the command
-    python edfs.py <command> <action-item>
+    python edfs.py <command> [options] <action-item>
     OR
-    python3 edfs.py <command> <action-item>
+    python3 edfs.py <command> [options] <action-item>
 
     Examples:
     1.  python edfs.py -mkdir /kayvan/test
         python edfs.py -mkdir /test-user
 
+        python edfs.py -mkdir -p /kayvan/a/b/c
+
     2.  python edfs.py -create /kayvan/test.txt
 
     3.  python edfs.py -rmdir /test-user
@@ -374,10 +1681,21 @@ if __name__ == "__main__":
     4.  python edfs.py -ls /
         python edfs.py -ls /test
 
-    5.  python edfs.py -rm /kayvan/test.txt
+    5.  python edfs.py -put ./local.txt /kayvan/local.txt
+        python edfs.py -cat /kayvan/local.txt
+
+    6.  python edfs.py -rm /kayvan/test.txt
+        python edfs.py -rmr /kayvan
+        python edfs.py -rmr -dryrun /kayvan
+
+    7.  python edfs.py -export output.xml
+
+    8.  python edfs.py -batch commands.txt
+        cat commands.txt | python edfs.py -batch -
 
-    6.  python edfs.py -export output.xml
+    To use the local embedded backend instead of Firebase set the DB URL
+        EDFS_BASE_URI=sqlite:///tmp/edfs.db python edfs.py -ls /
     """
     args = parse_args(sys.argv)
-    fs = HDFSEmulator(args["command"], args["action_item"])
+    fs = HDFSEmulator(args["command"], args["action_item"], options=args["options"])
     fs.execute()
@@ -0,0 +1,629 @@
+import contextlib
+import functools
+import io
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+from load import ColumnarConfig, LoadDatabase, NamespaceIndex, load_many, tee_rows
+
+# create.sql in the SQLite dialect, used as a local stand-in for MySQL
+SQLITE_SCHEMA = """
+CREATE TABLE inode
+(
+    id INT,
+    type CHAR (10) NOT NULL,
+    name CHAR (30) NOT NULL,
+    replication TINYINT DEFAULT 1,
+    mtime BIGINT,
+    atime BIGINT,
+    preferredBlockSize INT DEFAULT 134217728,
+    permission CHAR (120),
+    cluster VARCHAR (64) NOT NULL DEFAULT '',
+    PRIMARY KEY (cluster, id)
+);
+
+CREATE TABLE blocks
+(
+    id INT,
+    inumber INT,
+    genstamp INT,
+    numBytes INT NOT NULL,
+    cluster VARCHAR (64) NOT NULL DEFAULT '',
+    PRIMARY KEY (cluster, id),
+    FOREIGN KEY (cluster, inumber) REFERENCES inode(cluster, id)
+        ON DELETE CASCADE ON UPDATE NO ACTION
+);
+
+CREATE TABLE directory
+(
+    parent INT,
+    child INT,
+    cluster VARCHAR (64) NOT NULL DEFAULT '',
+    FOREIGN KEY (cluster, parent) REFERENCES inode(cluster, id)
+        ON DELETE CASCADE ON UPDATE NO ACTION,
+    FOREIGN KEY (cluster, child) REFERENCES inode(cluster, id)
+        ON DELETE CASCADE ON UPDATE NO ACTION
+);
+
+CREATE TABLE path
+(
+    id INT,
+    path VARCHAR (700) NOT NULL,
+    file_count BIGINT NOT NULL,
+    total_bytes BIGINT NOT NULL,
+    max_mtime BIGINT,
+    cluster VARCHAR (64) NOT NULL DEFAULT '',
+    PRIMARY KEY (cluster, id),
+    FOREIGN KEY (cluster, id) REFERENCES inode(cluster, id)
+        ON DELETE CASCADE ON UPDATE NO ACTION
+);
+
+CREATE INDEX path_path ON path (cluster, path);
+
+-- InnoDB indexes foreign key columns implicitly, SQLite does not
+CREATE INDEX blocks_inumber ON blocks (cluster, inumber);
+CREATE INDEX directory_parent ON directory (cluster, parent);
+CREATE INDEX directory_child ON directory (cluster, child);
+"""
+
+
+def connect(db_path: str = ":memory:", schema: bool = True) -> sqlite3.Connection:
+    """Open a SQLite stand-in DB, creating the homework-3 schema"""
+    connection = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+    connection.execute("PRAGMA foreign_keys = ON")
+    if schema:
+        connection.executescript(SQLITE_SCHEMA)
+    return connection
+
+
+def make_fsimage(
+    path: str, inodes: int, fanout: int = 32, blocks: int = 2, touch: int = 0
+):
+    """Write a synthetic fsimage XML with `inodes` inodes, every directory holding
+    `fanout` children, one in eight of them a sub directory. With `touch` every
+    touch-th file gets a new mtime and first block genstamp, like a later snapshot."""
+    root_id, block_id = 16385, 1073741825
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0"?>\n<fsimage>\n<INodeSection>')
+        f.write(
+            f"<lastInodeId>{root_id + inodes - 1}</lastInodeId>"
+            f"<numInodes>{inodes}</numInodes>"
+        )
+        directories, parents, next_id = {root_id: []}, [root_id], root_id + 1
+        f.write(
+            f"<inode><id>{root_id}</id><type>DIRECTORY</type><name></name>"
+            "<mtime>1675116934236</mtime>"
+            "<permission>ubuntu:supergroup:0755</permission></inode>\n"
+        )
+        while next_id < root_id + inodes:
+            parent = parents.pop(0)
+            for i in range(fanout):
+                if next_id >= root_id + inodes:
+                    break
+                inode_id, next_id = next_id, next_id + 1
+                directories[parent].append(inode_id)
+                mtime = 1675116934236 + inode_id
+                touched = touch and inode_id % touch == 0
+                if i % 8 == 0:
+                    directories[inode_id] = []
+                    parents.append(inode_id)
+                    f.write(
+                        f"<inode><id>{inode_id}</id><type>DIRECTORY</type>"
+                        f"<name>dir{inode_id}</name><mtime>{mtime}</mtime>"
+                        "<permission>ubuntu:supergroup:0755</permission></inode>\n"
+                    )
+                    continue
+                f.write(
+                    f"<inode><id>{inode_id}</id><type>FILE</type>"
+                    f"<name>file{inode_id}.txt</name>"
+                    f"<replication>{1 + inode_id % 3}</replication>"
+                    f"<mtime>{mtime + touched}</mtime><atime>{mtime}</atime>"
+                    "<preferredBlockSize>134217728</preferredBlockSize>"
+                    f"<permission>user{inode_id % 8}:supergroup:0644</permission>"
+                    "<blocks>"
+                )
+                for i in range(blocks):
+                    genstamp = block_id - 1073740824 + (touched and i == 0) * 10**6
+                    f.write(
+                        f"<block><id>{block_id}</id><genstamp>{genstamp}</genstamp>"
+                        f"<numBytes>{inode_id % 100000}</numBytes></block>"
+                    )
+                    block_id += 1
+                f.write("</blocks></inode>\n")
+        f.write("</INodeSection>\n<INodeDirectorySection>")
+        for parent, children in directories.items():
+            if children:
+                f.write(f"<directory><parent>{parent}</parent>")
+                f.write("".join(f"<child>{child}</child>" for child in children))
+                f.write("</directory>\n")
+        f.write("</INodeDirectorySection>\n</fsimage>\n")
+
+
+def load_per_row(loader: LoadDatabase):
+    """The original load path, one execute and one print per row"""
+    for inode, blocks in loader.iter_inodes():
+        loader.create_inode(*inode[:6], inode[7], inode[6])
+        for block in blocks:
+            loader.create_block(block[0], block[1], block[3], block[2])
+    for rows in loader.iter_directories():
+        for parent, child in rows:
+            loader.create_dir(parent, child)
+    loader.connection.commit()
+
+
+def table_counts(connection: sqlite3.Connection) -> tuple:
+    return tuple(
+        connection.execute(f"select count(*) from {table}").fetchone()[0]
+        for table in ("inode", "blocks", "directory")
+    )
+
+
+def bench_batched_load(fs_xml_path: str, batch_sizes: tuple = (100, 1000, 10000)):
+    """Compare per row inserts against executemany batches on a file backed SQLite DB.
+    The fsimage is parsed once up front so only the inserts are timed."""
+    start = time.perf_counter()
+    parser = LoadDatabase(fs_xml_path, connection=connect())
+    inodes, dirs = list(parser.iter_inodes()), list(parser.iter_directories())
+    print(
+        f"[load] {os.path.getsize(fs_xml_path) / 2**20:.1f} MiB fsimage, "
+        f"parsed in {time.perf_counter() - start:.3f}s"
+    )
+    runs = [("per row", None)] + [(f"batch {size}", size) for size in batch_sizes]
+    expected = None
+    for name, batch_size in runs:
+        db_path = os.path.join(tempfile.mkdtemp(), "hdfs.db")
+        loader = LoadDatabase(
+            fs_xml_path, connection=connect(db_path), batch_size=batch_size
+        )
+        loader.iter_inodes, loader.iter_directories = lambda: iter(
+            inodes
+        ), lambda: iter(dirs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if batch_size is None:
+                load_per_row(loader)
+            else:
+                loader.load_inodes_blocks_table()
+                loader.load_directory_table()
+                loader.connection.commit()
+            elapsed = time.perf_counter() - start
+        counts = table_counts(loader.connection)
+        expected = expected or counts
+        assert counts == expected, (counts, expected)
+        print(f"\t{name:<12}: {elapsed:7.3f}s, {sum(counts) / elapsed:10,.0f} rows/s")
+        loader.connection.close()
+
+
+def bench_parallel_load(fs_xml_path: str, workers: tuple = (1, 2, 4)):
+    """Compare the sequential streaming load against the parser + writers pipeline"""
+    print("[pipeline] sequential vs parallel writers, streaming parser")
+    expected = None
+    for count in (0,) + workers:
+        db_path = os.path.join(tempfile.mkdtemp(), "hdfs.db")
+        connect(db_path).close()
+        loader = LoadDatabase(
+            fs_xml_path,
+            streaming=True,
+            batch_size=5000,
+            workers=count,
+            connection_factory=lambda: connect(db_path, schema=False),
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if count:
+                stages = loader.load_parallel(count)
+            else:
+                loader.load_rows(loader.iter_rows())
+                loader.connection.commit()
+            elapsed = time.perf_counter() - start
+        counts = table_counts(connect(db_path, schema=False))
+        expected = expected or counts
+        assert counts == expected, (counts, expected)
+        rows = sum(counts)
+        name = f"{count} writers" if count else "sequential"
+        line = f"\t{name:<12}: {elapsed:7.3f}s, {rows / elapsed:9,.0f} rows/s"
+        if count:
+            line += (
+                f" (parser busy {stages['parse']:.2f}s, "
+                f"waiting {stages['blocked']:.2f}s, "
+                f"writers busy {sum(stages['write']):.2f}s)"
+            )
+        print(line)
+        loader.connection.close()
+
+
+def bench_incremental(inodes: int = 10**5, deleted: int = 500, touch: int = 100):
+    """Reload a later snapshot of a loaded namespace, from scratch and incrementally"""
+    old_path = os.path.join(tempfile.mkdtemp(), "fsimage-old.xml")
+    new_path = os.path.join(tempfile.mkdtemp(), "fsimage-new.xml")
+    make_fsimage(old_path, inodes)
+    make_fsimage(new_path, inodes - deleted, touch=touch)
+    print(
+        f"[incremental] {inodes:,} inodes, {deleted} deleted, "
+        f"one in {touch} files modified"
+    )
+
+    tables = []
+    for mode in ("full reload", "incremental"):
+        connection = connect(os.path.join(tempfile.mkdtemp(), "hdfs.db"))
+        loader = LoadDatabase(old_path, connection=connection, streaming=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader.load_rows(loader.iter_rows())
+            connection.commit()
+            loader = LoadDatabase(new_path, connection=connection, streaming=True)
+            start = time.perf_counter()
+            if mode == "incremental":
+                summary = loader.load_incremental()
+            else:
+                for table in ("directory", "blocks", "inode"):
+                    connection.execute(f"delete from {table}")
+                loader.load_rows(loader.iter_rows())
+                connection.commit()
+            elapsed = time.perf_counter() - start
+        tables.append(
+            [
+                sorted(connection.execute(f"select * from {table}"))
+                for table in ("inode", "blocks", "directory")
+            ]
+        )
+        line = f"\t{mode:<12}: {elapsed:7.3f}s"
+        if mode == "incremental":
+            line += f" ({sum(map(sum, summary.values()))} changed rows)"
+        print(line)
+        connection.close()
+    assert tables[0] == tables[1]
+
+
+# Analytics over the loaded tables, SQLite dialect of the MySQL queries, eg: MySQL
+# uses substring_index(permission, ':', 1) for the user
+ANALYTICS_SQL = {
+    "space per user": """
+        select
+            substr(i.permission, 1, instr(i.permission, ':') - 1) as user,
+            sum(b.numBytes)
+        from inode as i join blocks as b on b.cluster = i.cluster and b.inumber = i.id
+        group by user
+    """,
+    "small files": """
+        select count(*)
+        from inode as i
+            left join (
+                select cluster, inumber, sum(numBytes) as size
+                from blocks group by cluster, inumber
+            ) as b
+            on b.cluster = i.cluster and b.inumber = i.id
+        where i.type = 'FILE' and coalesce(b.size, 0) < 65536
+    """,
+    "replication": """
+        select replication, count(*) from inode where type = 'FILE' group by replication
+    """,
+}
+
+
+def analytics_arrow(read) -> dict:
+    """The ANALYTICS_SQL queries with pyarrow compute, `read(table, columns)` loads
+    the columns of a table"""
+    import pyarrow.compute as pc
+
+    results = {}
+    blocks = read("blocks", ["inumber", "numBytes"])
+    sizes = blocks.group_by("inumber").aggregate([("numBytes", "sum")])
+
+    inode = read("inode", ["id", "permission"])
+    # Aggregate by the few distinct permissions, then fold them into users
+    per_permission = (
+        sizes.join(inode, keys="inumber", right_keys="id")
+        .group_by("permission")
+        .aggregate([("numBytes_sum", "sum")])
+    )
+    users = {}
+    for permission, size in zip(*per_permission.to_pydict().values()):
+        user = permission.split(":")[0]
+        users[user] = users.get(user, 0) + size
+    results["space per user"] = sorted(users.items())
+
+    files = read("inode", ["id", "type", "replication"])
+    files = files.filter(pc.equal(files["type"].cast("string"), "FILE"))
+    file_sizes = files.join(
+        sizes, keys="id", right_keys="inumber", join_type="left outer"
+    )
+    small = pc.less(pc.fill_null(file_sizes["numBytes_sum"], 0), 65536)
+    results["small files"] = [(pc.sum(small).as_py() or 0,)]
+
+    replication = files.group_by("replication").aggregate([("id", "count")])
+    results["replication"] = sorted(zip(*replication.to_pydict().values()))
+    return results
+
+
+def bench_columnar(fs_xml_path: str):
+    """Analytics queries over the SQLite stand-in tables vs Parquet and Arrow IPC files
+    written in the same load pass"""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    print("[columnar] SQL over the loaded tables vs pyarrow over columnar files")
+    output_dir = tempfile.mkdtemp()
+    db_path = os.path.join(output_dir, "hdfs.db")
+    connect(db_path).close()
+    timings = {}
+    for format in (None, "parquet", "arrow"):
+        if format:
+            os.remove(db_path)
+            connect(db_path).close()
+        loader = LoadDatabase(
+            fs_xml_path,
+            connection=connect(db_path, schema=False),
+            streaming=True,
+            batch_size=5000,
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            loader.load(export_dir=output_dir if format else None, export_format=format)
+            timings[format] = time.perf_counter() - start
+    sizes = {
+        format: sum(
+            os.path.getsize(os.path.join(output_dir, f"{table}.{format}"))
+            for table in ("inode", "blocks", "directory")
+        )
+        for format in ("parquet", "arrow")
+    }
+    print(
+        f"\tload {timings[None]:.2f}s, with Parquet {timings['parquet']:.2f}s "
+        f"({sizes['parquet'] / 2**20:.1f} MiB), with Arrow {timings['arrow']:.2f}s "
+        f"({sizes['arrow'] / 2**20:.1f} MiB), "
+        f"SQLite {os.path.getsize(db_path) / 2**20:.1f} MiB, "
+        f"{ColumnarConfig.row_group_size:,} rows per row group"
+    )
+
+    connection = connect(db_path, schema=False)
+    readers = {
+        "parquet": lambda table, columns: pq.read_table(
+            os.path.join(output_dir, f"{table}.parquet"), columns=columns
+        ),
+        "arrow": lambda table, columns: ipc.open_file(
+            pa.memory_map(os.path.join(output_dir, f"{table}.arrow"))
+        )
+        .read_all()
+        .select(columns),
+    }
+    start = time.perf_counter()
+    expected = {}
+    for name, sql in ANALYTICS_SQL.items():
+        query_start = time.perf_counter()
+        expected[name] = sorted(tuple(row) for row in connection.execute(sql))
+        print(
+            f"\t{'sql ' + name:<24}: "
+            f"{(time.perf_counter() - query_start) * 1000:8.1f} ms"
+        )
+    print(f"\t{'sql total':<24}: {(time.perf_counter() - start) * 1000:8.1f} ms")
+    for format, read in readers.items():
+        start = time.perf_counter()
+        results = analytics_arrow(read)
+        elapsed = time.perf_counter() - start
+        assert {name: sorted(rows) for name, rows in results.items()} == expected
+        print(f"\t{format + ' total':<24}: {elapsed * 1000:8.1f} ms")
+    connection.close()
+
+
+# Answered from the adjacency tables with recursive queries, and from the path table
+PATH_SQL = {
+    "path of inode": (
+        """
+        with recursive up(id, path) as (
+            select id, name from inode where cluster = :cluster and id = :id
+            union all
+            select d.parent, i.name || '/' || up.path
+            from up
+                join directory as d on d.cluster = :cluster and d.child = up.id
+                join inode as i on i.cluster = :cluster and i.id = d.parent
+        )
+        select path from up order by length(path) desc limit 1
+        """,
+        "select path from path where cluster = :cluster and id = :id",
+    ),
+    "subtree rollup": (
+        """
+        with recursive sub(id) as (
+            select :id
+            union all
+            select d.child
+            from directory as d join sub on d.cluster = :cluster and d.parent = sub.id
+        )
+        select
+            (
+                select count(*)
+                from sub join inode as i on i.cluster = :cluster and i.id = sub.id
+                where i.type = 'FILE'
+            ),
+            (
+                select coalesce(sum(b.numBytes), 0)
+                from sub join blocks as b on b.cluster = :cluster and b.inumber = sub.id
+            ),
+            (
+                select max(i.mtime)
+                from sub join inode as i on i.cluster = :cluster and i.id = sub.id
+            )
+        """,
+        "select file_count, total_bytes, max_mtime from path "
+        "where cluster = :cluster and id = :id",
+    ),
+    "subtree listing": (
+        """
+        with recursive sub(id) as (
+            select :id
+            union all
+            select d.child
+            from directory as d join sub on d.cluster = :cluster and d.parent = sub.id
+        )
+        select count(*) from sub
+        """,
+        """
+        with prefix(path) as (
+            select rtrim(path, '/') from path where cluster = :cluster and id = :id
+        )
+        select count(*) from path, prefix
+        where path.cluster = :cluster
+            and (
+                path.path = prefix.path
+                or (path.path >= prefix.path || '/' and path.path < prefix.path || '0')
+            )
+        """,
+    ),
+}
+
+
+def bench_paths(fs_xml_path: str, queries: int = 20):
+    """Latency of path and subtree queries before and after the path table"""
+    connection = connect(os.path.join(tempfile.mkdtemp(), "hdfs.db"))
+    loader = LoadDatabase(
+        fs_xml_path, connection=connection, streaming=True, batch_size=5000
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        loader.load_rows(tee_rows(loader.iter_rows(), index := NamespaceIndex()))
+        connection.commit()
+        load_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        loader.load_paths(index)
+        paths_elapsed = time.perf_counter() - start
+    # InnoDB keeps index statistics up to date, SQLite plans the range scans and the
+    # recursive joins badly without them
+    connection.execute("analyze")
+    inodes = len(index.inodes)
+    print(
+        f"[paths] {inodes:,} inodes, load {load_elapsed:.2f}s, "
+        f"path table {paths_elapsed:.2f}s, {queries} random queries each"
+    )
+
+    rng = random.Random(551)
+    ids = [row[0] for row in connection.execute("select id from inode")]
+    dirs = [
+        row[0]
+        for row in connection.execute("select id from inode where type = 'DIRECTORY'")
+    ]
+    for name, (before, after) in PATH_SQL.items():
+        sample = rng.sample(ids if name == "path of inode" else dirs, queries)
+        # Also the root, the worst case of the recursive queries
+        if name != "path of inode":
+            sample[0] = dirs[0]
+        timings = []
+        for sql in (before, after):
+            start = time.perf_counter()
+            results = [
+                tuple(connection.execute(sql, {"cluster": "", "id": id}).fetchone())
+                for id in sample
+            ]
+            timings.append((time.perf_counter() - start) / queries * 1000)
+            if sql is before:
+                # The recursive query builds an empty path for the root
+                expected = [row if row != ("",) else ("/",) for row in results]
+        assert expected == results, name
+        print(
+            f"\t{name:<16}: recursive {timings[0]:9.3f} ms, "
+            f"path table {timings[1]:7.3f} ms ({timings[0] / timings[1]:,.0f}x)"
+        )
+    connection.close()
+
+
+def bench_multi_file(
+    inodes: int = 5 * 10**4, files: int = 4, processes: tuple = (1, 4)
+):
+    """Load several fsimages into their own clusters, one at a time and with a
+    process pool"""
+    print(f"[multi-file] {files} fsimages of {inodes:,} inodes, {os.cpu_count()} CPUs")
+    fs_xml_dir = tempfile.mkdtemp()
+    fs_xml_paths = [os.path.join(fs_xml_dir, f"cluster{i}.xml") for i in range(files)]
+    for path in fs_xml_paths:
+        make_fsimage(path, inodes)
+    for count in processes:
+        db_path = os.path.join(tempfile.mkdtemp(), "hdfs.db")
+        connect(db_path).close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            results = load_many(
+                fs_xml_paths,
+                {"streaming": True, "batch_size": 5000},
+                processes=count,
+                connection_factory=functools.partial(connect, db_path, schema=False),
+            )
+            elapsed = time.perf_counter() - start
+        assert not any(result["error"] for result in results)
+        clusters = connect(db_path, schema=False).execute(
+            "select cluster, count(*) from inode group by cluster"
+        )
+        assert dict(clusters) == {f"cluster{i}": inodes for i in range(files)}
+        rows = sum(sum(result["counts"].values()) for result in results)
+        print(f"\t{count} processes : {elapsed:7.3f}s, {rows / elapsed:9,.0f} rows/s")
+
+
+def peak_rss() -> float:
+    """Peak RSS of this process in MiB. VmHWM starts over at exec, unlike ru_maxrss
+    which a spawned process inherits from its parent."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_peak_rss(fs_xml_path: str, streaming: bool) -> tuple:
+    """Parse every row of the fsimage and report the peak RSS of this process. Runs
+    in a fresh process as lxml allocates outside of the Python heap."""
+    start = time.perf_counter()
+    loader = LoadDatabase(fs_xml_path, connection=connect(), streaming=streaming)
+    rows = sum(
+        len(rows[1]) + 1 if tag == "inode" else len(rows)
+        for tag, rows in loader.iter_rows()
+    )
+    elapsed = time.perf_counter() - start
+    return rows, elapsed, peak_rss()
+
+
+def bench_streaming(sizes: tuple = (10**4, 10**5, 3 * 10**5)):
+    """Peak memory and parse time of the DOM and the iterparse fsimage parsers"""
+    print("[parser] DOM + XPath vs streaming iterparse")
+    context = multiprocessing.get_context("spawn")
+    for inodes in sizes:
+        fs_xml_path = os.path.join(tempfile.mkdtemp(), "fsimage.xml")
+        make_fsimage(fs_xml_path, inodes)
+        results = {}
+        for streaming in (False, True):
+            with context.Pool(1) as pool:
+                results[streaming] = pool.apply(
+                    parse_peak_rss, (fs_xml_path, streaming)
+                )
+        assert results[False][0] == results[True][0]
+        print(
+            f"\t{os.path.getsize(fs_xml_path) / 2**20:6.1f} MiB, {inodes:>9,} inodes : "
+            f"DOM {results[False][1]:6.2f}s {results[False][2]:7.1f} MiB peak, "
+            f"streaming {results[True][1]:6.2f}s {results[True][2]:7.1f} MiB peak"
+        )
+        os.remove(fs_xml_path)
+
+
+if __name__ == "__main__":
+    """To run the benchmarks against a SQLite stand-in for MySQL execute the command
+    python benchmark.py [inodes]
+
+    Eg: python benchmark.py 1000000
+    """
+    inodes = int(sys.argv[1]) if len(sys.argv) > 1 else 10**5
+    fs_xml_path = os.path.join(tempfile.mkdtemp(), "fsimage.xml")
+    make_fsimage(fs_xml_path, inodes)
+    bench_batched_load(fs_xml_path)
+    bench_parallel_load(fs_xml_path)
+    bench_incremental(inodes)
+    bench_columnar(fs_xml_path)
+    bench_paths(fs_xml_path)
+    bench_multi_file()
+    bench_streaming()
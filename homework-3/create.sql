@@ -2,6 +2,7 @@
 CREATE DATABASE IF NOT EXISTS dsci551;
 
 -- Drop tables
+DROP TABLE IF EXISTS `path`;
 DROP TABLE IF EXISTS `directory`;
 DROP TABLE IF EXISTS `blocks`;
 DROP TABLE IF EXISTS `inode`;
@@ -17,7 +18,8 @@ CREATE TABLE IF NOT EXISTS `inode`
     atime BIGINT,
     preferredBlockSize INT DEFAULT 134217728,  
     permission CHAR (120),
-    PRIMARY KEY (id)
+    cluster VARCHAR (64) NOT NULL DEFAULT '' COMMENT "cluster of the fsimage",
+    PRIMARY KEY (cluster, id)
 );
 
 CREATE TABLE IF NOT EXISTS `blocks`
@@ -26,14 +28,33 @@ CREATE TABLE IF NOT EXISTS `blocks`
     inumber INT (10) COMMENT "inode id of file",
     genstamp INT,
     numBytes INT NOT NULL,
-    PRIMARY KEY (id),
-    FOREIGN KEY (inumber) REFERENCES inode(id) ON DELETE CASCADE ON UPDATE NO ACTION
+    cluster VARCHAR (64) NOT NULL DEFAULT '' COMMENT "cluster of the fsimage",
+    PRIMARY KEY (cluster, id),
+    FOREIGN KEY (cluster, inumber) REFERENCES inode(cluster, id) ON DELETE CASCADE ON UPDATE NO ACTION
 );
 
 CREATE TABLE IF NOT EXISTS `directory`
 (
     parent INT COMMENT "inumber of parent dir",
     child INT COMMENT "inumber of file or directory under parent dir",
-    FOREIGN KEY (parent) REFERENCES inode(id) ON DELETE CASCADE ON UPDATE NO ACTION,
-    FOREIGN KEY (child) REFERENCES inode(id) ON DELETE CASCADE ON UPDATE NO ACTION
-);
\ No newline at end of file
+    cluster VARCHAR (64) NOT NULL DEFAULT '' COMMENT "cluster of the fsimage",
+    FOREIGN KEY (cluster, parent) REFERENCES inode(cluster, id) ON DELETE CASCADE ON UPDATE NO ACTION,
+    FOREIGN KEY (cluster, child) REFERENCES inode(cluster, id) ON DELETE CASCADE ON UPDATE NO ACTION
+);
+
+-- Full path of every inode with the rollups of its subtree, a file rolls up to itself
+CREATE TABLE IF NOT EXISTS `path`
+(
+    id INT COMMENT "inumber",
+    path VARCHAR (700) NOT NULL COMMENT "full path, / for the root",
+    file_count BIGINT NOT NULL COMMENT "files in the subtree",
+    total_bytes BIGINT NOT NULL COMMENT "numBytes of the blocks in the subtree",
+    max_mtime BIGINT COMMENT "latest mtime in the subtree",
+    cluster VARCHAR (64) NOT NULL DEFAULT '' COMMENT "cluster of the fsimage",
+    PRIMARY KEY (cluster, id),
+    FOREIGN KEY (cluster, id) REFERENCES inode(cluster, id) ON DELETE CASCADE ON UPDATE NO ACTION
+);
+
+-- Subtree queries are range scans:
+-- cluster = 'c' AND (path = '/a' OR (path >= '/a/' AND path < '/a0'))
+CREATE INDEX path_path ON `path` (cluster, path);
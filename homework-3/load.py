@@ -1,4 +1,14 @@
+import contextlib
+import glob
+import io
+import os
+import queue
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pymysql
 
 from lxml import etree
@@ -10,50 +20,370 @@ class MySQLDBConfig:
     user = "dsci551"
     password = "Dsci-551"
     db_name = "dsci551"
+    # Rows sent per executemany call
+    batch_size = 1000
+    # Batches per transaction
+    commit_interval = 10
+    # Writer threads, each with its own connection, of the parallel loader
+    workers = 4
+    # Batches buffered between the parser and the writers
+    queue_size = 8
+    # Processes loading fsimages concurrently when several files are given
+    processes = os.cpu_count() or 4
 
 
-class MySQLClient:
+# Columns of the tables in create.sql, in the order of the parsed rows. Every table
+# also has a cluster column, set from MySQLClient.cluster.
+COLUMNS = {
+    "inode": (
+        "id",
+        "type",
+        "name",
+        "replication",
+        "mtime",
+        "atime",
+        "preferredBlockSize",
+        "permission",
+    ),
+    "blocks": ("id", "inumber", "genstamp", "numBytes"),
+    "directory": ("parent", "child"),
+    "path": ("id", "path", "file_count", "total_bytes", "max_mtime"),
+}
+
+
+class ColumnarConfig:
+    """Parquet / Arrow IPC export config"""
+
+    # parquet or arrow
+    format = "parquet"
+    # Rows per Parquet row group and per Arrow record batch
+    row_group_size = 128 * 1024
+    # Columns stored as dictionary indices, they only have a few distinct values
+    dictionary_columns = ("type", "permission")
+
+
+class ColumnarWriter:
+    """Streams the inode, blocks and directory rows into one Parquet or Arrow IPC
+    file per table, a row group at a time, with the same columns as create.sql"""
+
+    def __init__(self, output_dir: str, format: str = None, row_group_size: int = None):
+        """
+        Args:
+            output_dir (str): Directory of the <table>.parquet / <table>.arrow files
+            format (str, optional): parquet or arrow. Defaults to ColumnarConfig.format.
+            row_group_size (int, optional): Rows per row group. Defaults to
+                ColumnarConfig.row_group_size.
+        """
+        import pyarrow as pa
+
+        self.pa = pa
+        self.format = format or ColumnarConfig.format
+        assert self.format in ("parquet", "arrow"), f"Unknown format: {self.format}"
+        self.row_group_size = row_group_size or ColumnarConfig.row_group_size
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        self.schemas = {
+            "inode": pa.schema(
+                [
+                    ("id", pa.int64()),
+                    ("type", dictionary),
+                    ("name", pa.string()),
+                    ("replication", pa.int16()),
+                    ("mtime", pa.int64()),
+                    ("atime", pa.int64()),
+                    ("preferredBlockSize", pa.int64()),
+                    ("permission", dictionary),
+                ]
+            ),
+            "blocks": pa.schema(
+                [
+                    ("id", pa.int64()),
+                    ("inumber", pa.int64()),
+                    ("genstamp", pa.int64()),
+                    ("numBytes", pa.int64()),
+                ]
+            ),
+            "directory": pa.schema([("parent", pa.int64()), ("child", pa.int64())]),
+        }
+        # Dictionaries only grow, so every Arrow batch is a delta of the previous one
+        self.dictionaries = {column: {} for column in ColumnarConfig.dictionary_columns}
+        self.rows = {table: [] for table in self.schemas}
+        self.counts = {table: 0 for table in self.schemas}
+        os.makedirs(output_dir, exist_ok=True)
+        self.paths = {
+            table: os.path.join(output_dir, f"{table}.{self.format}")
+            for table in self.schemas
+        }
+        self.writers = {table: self._open(table) for table in self.schemas}
+
+    def _open(self, table: str):
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.ParquetWriter(
+                self.paths[table],
+                self.schemas[table],
+                use_dictionary=list(ColumnarConfig.dictionary_columns),
+            )
+        import pyarrow.ipc as ipc
+
+        return ipc.new_file(
+            self.paths[table],
+            self.schemas[table],
+            options=ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+        )
+
+    def _array(self, name: str, values: tuple, type_):
+        if name not in self.dictionaries:
+            return self.pa.array(values, type=type_)
+        dictionary = self.dictionaries[name]
+        indices = [dictionary.setdefault(value, len(dictionary)) for value in values]
+        return self.pa.DictionaryArray.from_arrays(
+            self.pa.array(indices, type=self.pa.int32()),
+            self.pa.array(list(dictionary)),
+        )
+
+    def _flush(self, table: str):
+        rows, schema = self.rows[table], self.schemas[table]
+        if not rows:
+            return
+        columns = [
+            self._array(field.name, values, field.type)
+            for field, values in zip(schema, zip(*rows))
+        ]
+        batch = self.pa.record_batch(columns, schema=schema)
+        if self.format == "parquet":
+            self.writers[table].write_batch(batch, row_group_size=self.row_group_size)
+        else:
+            self.writers[table].write_batch(batch)
+        self.counts[table] += len(rows)
+        self.rows[table] = []
+
+    def _append(self, table: str, rows: list):
+        self.rows[table].extend(rows)
+        if len(self.rows[table]) >= self.row_group_size:
+            self._flush(table)
+
+    def write(self, tag: str, rows):
+        """Add an item of `LoadDatabase.iter_rows`
+
+        Args:
+            tag (str): inode or directory
+            rows: (inode row, block rows) or directory rows
+        """
+        if tag == "inode":
+            self._append("inode", [rows[0]])
+            self._append("blocks", rows[1])
+        else:
+            self._append("directory", rows)
+
+    def close(self):
+        for table, writer in self.writers.items():
+            self._flush(table)
+            writer.close()
+
+
+class NamespaceIndex:
+    """Collects the namespace while it is loaded and materializes the full path of
+    every inode reachable from the root, with recursive rollups per directory: file
+    count, total numBytes and max mtime of the subtree. Files roll up to themselves."""
+
     def __init__(self):
-        self.connection = pymysql.connect(
+        # id -> (name, is file, numBytes, mtime)
+        self.inodes = {}
+        self.children = {}
+
+    def write(self, tag: str, rows):
+        """Add an item of `LoadDatabase.iter_rows`
+
+        Args:
+            tag (str): inode or directory
+            rows: (inode row, block rows) or directory rows
+        """
+        if tag == "inode":
+            inode, blocks = rows
+            self.inodes[inode[0]] = (
+                inode[2],
+                inode[1] == "FILE",
+                sum(block[3] for block in blocks),
+                inode[4],
+            )
+        else:
+            for parent, child in rows:
+                self.children.setdefault(parent, []).append(child)
+
+    def rows(self) -> list:
+        """Rows of the path table, (id, path, file_count, total_bytes, max_mtime), with
+        parents before their children"""
+        has_parent = {
+            child for children in self.children.values() for child in children
+        }
+        order = [
+            inode_id
+            for inode_id, inode in self.inodes.items()
+            if inode[0] == "" and inode_id not in has_parent
+        ]
+        paths, parents = {inode_id: "/" for inode_id in order}, {}
+        i = 0
+        while i < len(order):
+            parent = order[i]
+            prefix = paths[parent].rstrip("/")
+            for child in self.children.get(parent, ()):
+                if child in self.inodes and child not in paths:
+                    paths[child] = f"{prefix}/{self.inodes[child][0]}"
+                    parents[child] = parent
+                    order.append(child)
+            i += 1
+
+        totals = {}
+        for inode_id in order:
+            name, is_file, size, mtime = self.inodes[inode_id]
+            totals[inode_id] = [int(is_file), size, mtime]
+        for inode_id in reversed(order):
+            if inode_id in parents:
+                total, parent_total = totals[inode_id], totals[parents[inode_id]]
+                parent_total[0] += total[0]
+                parent_total[1] += total[1]
+                parent_total[2] = max(parent_total[2], total[2])
+        return [(inode_id, paths[inode_id], *totals[inode_id]) for inode_id in order]
+
+
+def tee_rows(items, *writers):
+    """Pass the items of `LoadDatabase.iter_rows` through, also writing them to every
+    writer, eg: a ColumnarWriter or a NamespaceIndex"""
+    for tag, rows in items:
+        for writer in writers:
+            writer.write(tag, rows)
+        yield tag, rows
+
+
+class MySQLClient:
+    def __init__(self, connection=None, cluster: str = ""):
+        """
+        Args:
+            connection (optional): Open DB-API connection to use instead of MySQL,
+                eg: a sqlite3 connection to a local stand-in DB. Defaults to None.
+            cluster (str, optional): Cluster id stored with every row. Defaults to "".
+        """
+        self.cluster = cluster
+        self.connection = connection or self.connect()
+        self.cursor = self.connection.cursor()
+        # sqlite3 uses qmark placeholders, pymysql uses format placeholders
+        self.placeholder = (
+            "?" if isinstance(self.connection, sqlite3.Connection) else "%s"
+        )
+
+    @staticmethod
+    def connect():
+        return pymysql.connect(
             host="localhost",
             user=MySQLDBConfig.user,
             password=MySQLDBConfig.password,
             db=MySQLDBConfig.db_name,
         )
-        self.cursor = self.connection.cursor()
+
+    def _insert_sql(self, table: str) -> str:
+        columns = COLUMNS[table] + ("cluster",)
+        return (
+            f"insert into {table} ({', '.join(columns)}) "
+            f"values ({','.join([self.placeholder] * len(columns))})"
+        )
+
+    def _with_cluster(self, rows: list) -> list:
+        return [tuple(row) + (self.cluster,) for row in rows]
 
     def create_inode(
         self, id, type, name, replication, mtime, atime, permission, preferredBlockSize
     ):
-        sql = "insert into inode values (%s,%s,%s,%s,%s,%s,%s,%s)"
+        sql = self._insert_sql("inode")
         resp = self.cursor.execute(
             sql,
-            (id, type, name, replication, mtime, atime, preferredBlockSize, permission),
+            (
+                id,
+                type,
+                name,
+                replication,
+                mtime,
+                atime,
+                preferredBlockSize,
+                permission,
+                self.cluster,
+            ),
         )
         print("Number of rows affected:", resp)
 
     def create_block(self, id, inumber, numBytes, genstamp):
-        sql = "insert into blocks values (%s,%s,%s,%s)"
+        sql = self._insert_sql("blocks")
         resp = self.cursor.execute(
             sql,
-            (id, inumber, genstamp, numBytes),
+            (id, inumber, genstamp, numBytes, self.cluster),
         )
         print("Number of rows affected:", resp)
 
     def create_dir(self, parent, child):
-        sql = "insert into directory values (%s,%s)"
+        sql = self._insert_sql("directory")
         resp = self.cursor.execute(
             sql,
-            (parent, child),
+            (parent, child, self.cluster),
         )
         print("Number of rows affected:", resp)
 
+    def create_inodes(self, rows: list):
+        """Insert inode rows, (id, type, name, replication, mtime, atime,
+        preferredBlockSize, permission), in one executemany call"""
+        self.cursor.executemany(self._insert_sql("inode"), self._with_cluster(rows))
+
+    def create_blocks(self, rows: list):
+        """Insert block rows, (id, inumber, genstamp, numBytes), in one executemany
+        call"""
+        self.cursor.executemany(self._insert_sql("blocks"), self._with_cluster(rows))
+
+    def create_dirs(self, rows: list):
+        """Insert directory rows, (parent, child), in one executemany call"""
+        self.cursor.executemany(self._insert_sql("directory"), self._with_cluster(rows))
+
 
 class LoadDatabase(MySQLClient):
-    def __init__(self, fs_xml_path: str = None):
-        super().__init__()
+    def __init__(
+        self,
+        fs_xml_path: str = None,
+        connection=None,
+        batch_size: int = None,
+        commit_interval: int = None,
+        streaming: bool = False,
+        workers: int = 1,
+        connection_factory=None,
+        cluster: str = "",
+    ):
+        """
+        Args:
+            fs_xml_path (str, optional): fsimage XML path. Defaults to None.
+            connection (optional): DB-API connection used instead of MySQL.
+                Defaults to None.
+            batch_size (int, optional): Rows per executemany call. Defaults to None.
+            commit_interval (int, optional): Batches per transaction. Defaults to None.
+            streaming (bool, optional): Parse the fsimage incrementally instead of
+                loading the whole document in memory. Defaults to False.
+            workers (int, optional): Writer threads, more than one runs the parallel
+                loader. Defaults to 1.
+            connection_factory (callable, optional): Opens a new connection for each
+                writer, eg: to a SQLite stand-in DB. Defaults to None.
+            cluster (str, optional): Cluster id of the fsimage, stored with every row
+                so several namespaces can share the tables. Defaults to "".
+        """
+        self.connection_factory = connection_factory or self.connect
+        super().__init__(
+            connection or (connection_factory and connection_factory()), cluster
+        )
         self.fs_xml_path = fs_xml_path
-        self.tree = self.get_tree(self.fs_xml_path)
+        self.batch_size = batch_size or MySQLDBConfig.batch_size
+        self.commit_interval = commit_interval or MySQLDBConfig.commit_interval
+        self.counts = {"inode": 0, "blocks": 0, "directory": 0}
+        self.error = None
+        self._batches = 0
+        self.streaming = streaming
+        self.workers = workers
+        self._lock = threading.Lock()
+        self.tree = None if streaming else self.get_tree(self.fs_xml_path)
 
     @staticmethod
     def get_tree(path):
@@ -72,62 +402,609 @@ class LoadDatabase(MySQLClient):
             return element.text.strip()
         return ""
 
-    def load_inodes_blocks_table(self):
+    def parse_inode(self, tag) -> tuple:
+        """Parse an inode element
+
+        Args:
+            tag (Element): inode element
+
+        Returns:
+            tuple: inode row and the list of its block rows
+        """
+        # One pass over the children, find() goes through the slower ElementPath
+        fields = {child.tag: child for child in reversed(tag)}
+        inode_id = self.parse_int(fields.get("id"))
+        inode = (
+            inode_id,
+            self.parse_str(fields.get("type")),
+            self.parse_str(fields.get("name")),
+            self.parse_int(fields.get("replication")),
+            self.parse_int(fields.get("mtime")),
+            self.parse_int(fields.get("atime")),
+            self.parse_int(fields.get("preferredBlockSize")),
+            self.parse_str(fields.get("permission")),
+        )
+        blocks = []
+        for block in fields.get("blocks", ()):
+            if block.tag != "block":
+                continue
+            block_fields = {child.tag: child for child in reversed(block)}
+            blocks.append(
+                (
+                    self.parse_int(block_fields.get("id")),
+                    inode_id,
+                    self.parse_int(block_fields.get("genstamp")),
+                    self.parse_int(block_fields.get("numBytes")),
+                )
+            )
+        return inode, blocks
+
+    def parse_directory(self, tag) -> list:
+        """Parse a directory element
+
+        Args:
+            tag (Element): directory element
+
+        Returns:
+            list: (parent, child) rows
+        """
+        parent = self.parse_int(tag.find("parent"))
+        return [(parent, int(child.text)) for child in tag.iterfind("child")]
+
+    def iter_elements(self):
+        """Stream the inode and directory elements of the fsimage with iterparse.
+        Every element is freed once it has been handled, together with the already
+        handled siblings, so memory stays flat however large the file is.
+
+        Yields:
+            Element: inode element of INodeSection or directory element of
+                INodeDirectorySection, in document order
+        """
+        sections = {"inode": "INodeSection", "directory": "INodeDirectorySection"}
+        context = etree.iterparse(
+            self.fs_xml_path, events=("end",), tag=tuple(sections)
+        )
+        for _, elem in context:
+            parent = elem.getparent()
+            if parent.tag == sections[elem.tag]:
+                yield elem
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del parent[0]
+        del context
+
+    def iter_rows(self):
+        """Parsed rows of the fsimage, in document order
+
+        Yields:
+            tuple: ("inode", (inode row, block rows)) or ("directory", directory rows)
+        """
+        if not self.streaming:
+            for item in self.iter_inodes():
+                yield "inode", item
+            for rows in self.iter_directories():
+                yield "directory", rows
+            return
+        for elem in self.iter_elements():
+            if elem.tag == "inode":
+                yield "inode", self.parse_inode(elem)
+            else:
+                yield "directory", self.parse_directory(elem)
+
+    def iter_inodes(self):
+        if self.streaming:
+            yield from (item for tag, item in self.iter_rows() if tag == "inode")
+            return
         for tag in self.tree.xpath("//INodeSection/inode"):
-            inode_id = self.parse_int(tag.find("id"))
-            type_ = self.parse_str(tag.find("type"))
-            name = self.parse_str(tag.find("name"))
-            replication = self.parse_int(tag.find("replication"))
-            mtime = self.parse_int(tag.find("mtime"))
-            atime = self.parse_int(tag.find("atime"))
-            preferredBlockSize = self.parse_int(tag.find("preferredBlockSize"))
-            permission = self.parse_str(tag.find("permission"))
-
-            self.create_inode(
-                id=inode_id,
-                type=type_,
-                name=name,
-                replication=replication,
-                mtime=mtime,
-                atime=atime,
-                permission=permission,
-                preferredBlockSize=preferredBlockSize,
+            yield self.parse_inode(tag)
+
+    def iter_directories(self):
+        if self.streaming:
+            yield from (rows for tag, rows in self.iter_rows() if tag == "directory")
+            return
+        for tag in self.tree.xpath("//INodeDirectorySection/directory"):
+            yield self.parse_directory(tag)
+
+    def _write_batch(self, inodes: list = (), blocks: list = (), dirs: list = ()):
+        """Insert one batch, inodes first so the block foreign keys resolve, and
+        commit every `commit_interval` batches"""
+        if inodes:
+            self.create_inodes(inodes)
+        if blocks:
+            self.create_blocks(blocks)
+        if dirs:
+            self.create_dirs(dirs)
+        self._batches += 1
+        if self._batches % self.commit_interval == 0:
+            self.connection.commit()
+        self._count(inodes, blocks, dirs)
+
+    def _count(self, inodes: list, blocks: list, dirs: list):
+        """Add a written batch to the row counts and print the progress"""
+        with self._lock:
+            self.counts["inode"] += len(inodes)
+            self.counts["blocks"] += len(blocks)
+            self.counts["directory"] += len(dirs)
+            print(
+                f"\rLoaded {self.counts['inode']} inodes, "
+                f"{self.counts['blocks']} blocks, "
+                f"{self.counts['directory']} directory rows",
+                end="",
+                flush=True,
             )
 
-            blocks = tag.xpath("./blocks/block")
-            if len(blocks) != 0:
-                for block in blocks:
-                    block_id = self.parse_int(block.xpath("./id")[0])
-                    genstamp = self.parse_int(block.xpath("./genstamp")[0])
-                    numBytes = self.parse_int(block.xpath("./numBytes")[0])
-
-                    self.create_block(
-                        id=block_id,
-                        inumber=inode_id,
-                        numBytes=numBytes,
-                        genstamp=genstamp,
+    def load_rows(self, items):
+        """Insert the items of `iter_rows` in batches. Directory rows only reference
+        inodes of the same or earlier batches, as INodeDirectorySection follows
+        INodeSection in the fsimage.
+
+        Args:
+            items (iterable): ("inode", (inode row, block rows)) or ("directory", rows)
+        """
+        inodes, blocks, dirs = [], [], []
+        for tag, rows in items:
+            if tag == "inode":
+                inodes.append(rows[0])
+                blocks.extend(rows[1])
+            else:
+                dirs.extend(rows)
+            if len(inodes) + len(blocks) + len(dirs) >= self.batch_size:
+                self._write_batch(inodes=inodes, blocks=blocks, dirs=dirs)
+                inodes, blocks, dirs = [], [], []
+        if inodes or dirs:
+            self._write_batch(inodes=inodes, blocks=blocks, dirs=dirs)
+
+    def load_parallel(
+        self, workers: int = None, queue_size: int = None, items=None
+    ) -> dict:
+        """Pipelined load: this thread parses the fsimage into batches and a pool of
+        writer threads, each with its own connection, inserts and commits them. An
+        inode batch carries the blocks of its inodes in the same transaction. The
+        directory rows are only queued once every inode batch has been committed,
+        so all foreign keys resolve without deferring the constraints.
+
+        Args:
+            workers (int, optional): Writer threads. Defaults to MySQLDBConfig.workers.
+            queue_size (int, optional): Batches buffered between the parser and the
+                writers. Defaults to MySQLDBConfig.queue_size.
+            items (iterable, optional): Items of `iter_rows`. Defaults to None.
+
+        Returns:
+            dict: Seconds spent per stage
+        """
+        workers = workers or MySQLDBConfig.workers
+        batches = queue.Queue(maxsize=queue_size or MySQLDBConfig.queue_size)
+        busy, errors = [0.0] * workers, []
+
+        def writer(worker: int):
+            client = None
+            try:
+                client = MySQLClient(self.connection_factory(), self.cluster)
+            except Exception as e:
+                errors.append(e)
+            while True:
+                batch = batches.get()
+                try:
+                    if batch is None:
+                        break
+                    if client is None or errors:
+                        # Keep draining so the parser never blocks on a full queue
+                        continue
+                    start = time.perf_counter()
+                    inodes, blocks, dirs = batch
+                    if inodes:
+                        client.create_inodes(inodes)
+                    if blocks:
+                        client.create_blocks(blocks)
+                    if dirs:
+                        client.create_dirs(dirs)
+                    client.connection.commit()
+                    busy[worker] += time.perf_counter() - start
+                    self._count(inodes, blocks, dirs)
+                except Exception as e:
+                    client.connection.rollback()
+                    errors.append(e)
+                finally:
+                    batches.task_done()
+            if client is not None:
+                client.cursor.close()
+                client.connection.close()
+
+        threads = [
+            threading.Thread(target=writer, args=(i,), daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        start, blocked, inodes_done = time.perf_counter(), 0.0, False
+        inodes, blocks, dirs = [], [], []
+
+        def put(batch: tuple):
+            nonlocal blocked
+            wait = time.perf_counter()
+            batches.put(batch)
+            blocked += time.perf_counter() - wait
+
+        try:
+            for tag, rows in items or self.iter_rows():
+                if errors:
+                    break
+                if tag == "inode":
+                    inodes.append(rows[0])
+                    blocks.extend(rows[1])
+                else:
+                    if inodes:
+                        put((inodes, blocks, []))
+                        inodes, blocks = [], []
+                    if not inodes_done:
+                        # Barrier: every inode is committed before the first
+                        # directory row
+                        wait = time.perf_counter()
+                        batches.join()
+                        blocked += time.perf_counter() - wait
+                        inodes_done = True
+                    dirs.extend(rows)
+                if len(inodes) + len(blocks) + len(dirs) >= self.batch_size:
+                    put((inodes, blocks, dirs))
+                    inodes, blocks, dirs = [], [], []
+            if inodes or dirs:
+                put((inodes, blocks, dirs))
+        finally:
+            parse_elapsed = time.perf_counter() - start
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        rows = sum(self.counts.values())
+        print(
+            f"\nParser : {rows} rows in {parse_elapsed - blocked:.3f}s busy "
+            f"({rows / max(parse_elapsed - blocked, 1e-9):.0f} rows/s), "
+            f"{blocked:.3f}s waiting on writers"
+        )
+        print(
+            f"Writers: {rows} rows in {sum(busy):.3f}s busy over {workers} workers "
+            f"({rows / max(sum(busy), 1e-9):.0f} rows/s per worker, "
+            f"{rows / max(elapsed, 1e-9):.0f} rows/s overall)"
+        )
+        return {"parse": parse_elapsed - blocked, "blocked": blocked, "write": busy}
+
+    def load_incremental(self, items=None) -> dict:
+        """Apply only the differences between the fsimage and the rows already in the
+        DB, eg: after loading an earlier snapshot of the same namespace. Inodes are
+        matched by id and blocks by block id, a row is updated when any column changed
+        (mtime for file content, genstamp and numBytes for blocks, name and permission
+        for renames and chmods). All deltas are applied in one transaction, inodes are
+        inserted before the rows referencing them and deleted after everything else.
+
+        Args:
+            items (iterable, optional): Items of `iter_rows`. Defaults to None.
+
+        Returns:
+            dict: (inserted, updated, deleted) rows per table
+        """
+        start = time.perf_counter()
+        p = self.placeholder
+        old = {}
+        for table in ("inode", "blocks", "directory"):
+            self.cursor.execute(
+                f"select {', '.join(COLUMNS[table])} from {table} where cluster = {p}",
+                (self.cluster,),
+            )
+            old[table] = [tuple(row) for row in self.cursor.fetchall()]
+        old_inodes = {row[0]: row for row in old["inode"]}
+        old_blocks = {row[0]: row for row in old["blocks"]}
+        old_dirs = set(old["directory"])
+
+        changes = {
+            table: {"insert": [], "update": [], "delete": []}
+            for table in ("inode", "blocks", "directory")
+        }
+
+        def diff(table: str, old: dict, row: tuple):
+            current = old.pop(row[0], None)
+            if current is None:
+                changes[table]["insert"].append(row)
+            elif current != row:
+                # Key last to match the update statement
+                changes[table]["update"].append(row[1:] + row[:1])
+
+        for tag, rows in items or self.iter_rows():
+            if tag == "inode":
+                diff("inode", old_inodes, rows[0])
+                for block in rows[1]:
+                    diff("blocks", old_blocks, block)
+            else:
+                for row in rows:
+                    if row in old_dirs:
+                        old_dirs.discard(row)
+                    else:
+                        changes["directory"]["insert"].append(row)
+        changes["inode"]["delete"] = [(inode_id,) for inode_id in old_inodes]
+        changes["blocks"]["delete"] = [(block_id,) for block_id in old_blocks]
+        changes["directory"]["delete"] = sorted(old_dirs)
+
+        # Every statement takes the cluster as its last parameter
+        statements = [
+            (
+                "delete from directory "
+                f"where parent = {p} and child = {p} and cluster = {p}",
+                "directory",
+                "delete",
+            ),
+            (
+                f"delete from blocks where id = {p} and cluster = {p}",
+                "blocks",
+                "delete",
+            ),
+            (self._insert_sql("inode"), "inode", "insert"),
+            (
+                f"update inode set type = {p}, name = {p}, replication = {p}, "
+                f"mtime = {p}, atime = {p}, preferredBlockSize = {p}, permission = {p} "
+                f"where id = {p} and cluster = {p}",
+                "inode",
+                "update",
+            ),
+            (self._insert_sql("blocks"), "blocks", "insert"),
+            (
+                f"update blocks set inumber = {p}, genstamp = {p}, numBytes = {p} "
+                f"where id = {p} and cluster = {p}",
+                "blocks",
+                "update",
+            ),
+            (self._insert_sql("directory"), "directory", "insert"),
+            # Last, as the delete cascades to rows that may have moved to other inodes
+            (f"delete from inode where id = {p} and cluster = {p}", "inode", "delete"),
+        ]
+        try:
+            for sql, table, action in statements:
+                if changes[table][action]:
+                    self.cursor.executemany(
+                        sql, self._with_cluster(changes[table][action])
                     )
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+        summary = {
+            table: tuple(
+                len(changes[table][action]) for action in ("insert", "update", "delete")
+            )
+            for table in changes
+        }
+        for table, (inserted, updated, deleted) in summary.items():
+            self.counts[table] = inserted + updated + deleted
+            print(f"{table}: {inserted} inserted, {updated} updated, {deleted} deleted")
+        print(
+            f"Applied {sum(map(sum, summary.values()))} changes in "
+            f"{time.perf_counter() - start:.3f}s"
+        )
+        return summary
+
+    def load_inodes_blocks_table(self):
+        self.load_rows(("inode", item) for item in self.iter_inodes())
 
     def load_directory_table(self):
-        for tag in self.tree.xpath("//INodeDirectorySection/directory"):
-            parent = self.parse_int(tag.find("parent"))
-            children = tag.findall("child")
-            for child in children:
-                child = int(child.text)
-                self.create_dir(parent=parent, child=child)
+        self.load_rows(("directory", rows) for rows in self.iter_directories())
+
+    def has_paths(self) -> bool:
+        """Whether the path table has rows for this cluster"""
+        self.cursor.execute(
+            f"select 1 from path where cluster = {self.placeholder} limit 1",
+            (self.cluster,),
+        )
+        return self.cursor.fetchone() is not None
+
+    def load_paths(self, index: NamespaceIndex):
+        """Replace the path table with the paths and rollups of the namespace index
+
+        Args:
+            index (NamespaceIndex): Index of the loaded namespace
+        """
+        rows = index.rows()
+        self.cursor.execute(
+            f"delete from path where cluster = {self.placeholder}", (self.cluster,)
+        )
+        sql = self._insert_sql("path")
+        for i in range(0, len(rows), self.batch_size):
+            self.cursor.executemany(
+                sql, self._with_cluster(rows[i : i + self.batch_size])
+            )
+        self.connection.commit()
+        print(f"Indexed {len(rows)} paths")
+
+    def export_columnar(self, output_dir: str, format: str = None) -> dict:
+        """Write the inode, blocks and directory tables of the fsimage as Parquet or
+        Arrow IPC files without loading them into the DB
 
-    def load(self):
+        Args:
+            output_dir (str): Output directory
+            format (str, optional): parquet or arrow. Defaults to ColumnarConfig.format.
+
+        Returns:
+            dict: Rows written per table
+        """
+        writer = ColumnarWriter(output_dir, format)
         try:
-            self.load_inodes_blocks_table()
-            self.load_directory_table()
-            self.connection.commit()
+            for _ in tee_rows(self.iter_rows(), writer):
+                pass
+        finally:
+            writer.close()
+        return writer.counts
+
+    def load(
+        self,
+        incremental: bool = False,
+        export_dir: str = None,
+        export_format: str = None,
+        paths: bool = False,
+    ):
+        """Load the fsimage into the DB
+
+        Args:
+            incremental (bool, optional): Only apply the changes since the loaded
+                snapshot. Defaults to False.
+            export_dir (str, optional): Also write the tables as columnar files into
+                this directory, in the same pass. Defaults to None.
+            export_format (str, optional): parquet or arrow. Defaults to None.
+            paths (bool, optional): Also rebuild the path table with the full path and
+                subtree rollups of every inode. Defaults to False, an incremental load
+                always rebuilds it if the cluster was already indexed.
+        """
+        writer, index = None, None
+        try:
+            start = time.perf_counter()
+            if incremental and not paths and self.has_paths():
+                # Renames, moves and size changes would leave a stale path table
+                paths = True
+            items = self.iter_rows()
+            if export_dir:
+                writer = ColumnarWriter(export_dir, export_format)
+                items = tee_rows(items, writer)
+            if paths:
+                index = NamespaceIndex()
+                items = tee_rows(items, index)
+            if incremental:
+                self.load_incremental(items)
+            elif self.workers > 1:
+                self.load_parallel(self.workers, items=items)
+            else:
+                self.load_rows(items)
+                self.connection.commit()
+                print()
+            if index is not None:
+                self.load_paths(index)
+            if incremental:
+                return
+            elapsed = time.perf_counter() - start
+            rows = sum(self.counts.values())
+            print(
+                f"Loaded {rows} rows in {elapsed:.3f}s "
+                f"({rows / max(elapsed, 1e-9):.0f} rows/s)"
+            )
         except Exception as e:
+            self.error = e
             print("Error occurred while loading data", e)
         finally:
+            if writer is not None:
+                writer.close()
+                print(f"Exported {sum(writer.counts.values())} rows to {export_dir}")
             self.cursor.close()
             self.connection.close()
 
 
+def load_file(
+    fs_xml_path: str,
+    cluster: str,
+    options: dict,
+    connection_factory=None,
+    quiet: bool = False,
+) -> dict:
+    """Load one fsimage
+
+    Args:
+        fs_xml_path (str): fsimage XML path
+        cluster (str): Cluster id of the fsimage
+        options (dict): Load options, as returned by `parse_args`
+        connection_factory (callable, optional): Opens a DB connection, eg: to a
+            SQLite stand-in DB. Defaults to None.
+        quiet (bool, optional): Discard the progress output. Defaults to False.
+
+    Returns:
+        dict: file, cluster, rows per table, elapsed seconds and error of the load
+    """
+    start = time.perf_counter()
+    result = {"file": fs_xml_path, "cluster": cluster, "counts": {}, "error": None}
+    output = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        try:
+            fs = LoadDatabase(
+                fs_xml_path,
+                batch_size=options.get("batch_size"),
+                streaming=options.get("streaming", False),
+                workers=options.get("workers", 1),
+                connection_factory=connection_factory,
+                cluster=cluster,
+            )
+            export_dir = None
+            if options.get("export_format"):
+                export_dir = os.path.splitext(os.path.basename(fs_xml_path))[0]
+            fs.load(
+                incremental=options.get("incremental", False),
+                export_dir=export_dir,
+                export_format=options.get("export_format"),
+                paths=options.get("paths", False),
+            )
+            result["counts"], result["error"] = fs.counts, fs.error and str(fs.error)
+        except Exception as e:
+            print("Error occurred while loading data", e)
+            result["error"] = str(e)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def load_many(
+    fs_xml_paths: list, options: dict, processes: int = None, connection_factory=None
+) -> list:
+    """Load several fsimages concurrently in a process pool. Every fsimage goes into
+    its own cluster, keyed by its file name without extension.
+
+    Args:
+        fs_xml_paths (list): fsimage XML paths
+        options (dict): Load options, as returned by `parse_args`
+        processes (int, optional): Worker processes.
+            Defaults to MySQLDBConfig.processes.
+        connection_factory (callable, optional): Picklable callable opening a DB
+            connection in the worker process. Defaults to None.
+
+    Returns:
+        list: Results of `load_file`, in the order of `fs_xml_paths`
+    """
+    clusters = [os.path.splitext(os.path.basename(path))[0] for path in fs_xml_paths]
+    assert len(set(clusters)) == len(clusters), "fsimage file names must be unique"
+
+    start, results = time.perf_counter(), {}
+    processes = min(processes or MySQLDBConfig.processes, len(fs_xml_paths))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {
+            pool.submit(
+                load_file, path, cluster, options, connection_factory, True
+            ): path
+            for path, cluster in zip(fs_xml_paths, clusters)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = f"error: {result['error']}" if result["error"] else "done"
+            print(f"[{len(results)}/{len(futures)}] {result['file']} {status}")
+    elapsed = time.perf_counter() - start
+
+    results = [results[path] for path in fs_xml_paths]
+    print(
+        f"\n{'file':<32} {'cluster':<20} {'inode':>10} {'blocks':>10} "
+        f"{'directory':>10} {'seconds':>8}  status"
+    )
+    for result in results:
+        counts = result["counts"]
+        print(
+            f"{result['file']:<32} {result['cluster']:<20} "
+            f"{counts.get('inode', 0):>10} {counts.get('blocks', 0):>10} "
+            f"{counts.get('directory', 0):>10} "
+            f"{result['elapsed']:>8.2f}  {'error' if result['error'] else 'ok'}"
+        )
+    rows = sum(sum(result["counts"].values()) for result in results)
+    print(
+        f"Loaded {len(results)} files, {rows} rows in {elapsed:.3f}s "
+        f"with {processes} processes ({rows / max(elapsed, 1e-9):.0f} rows/s)"
+    )
+    return results
+
+
 def parse_args(line: list) -> dict:
     """Parse the command line arguments
 
@@ -137,20 +1014,61 @@ def parse_args(line: list) -> dict:
     Returns:
         dict: Arguments dictionary
     """
-    args = {"file": line[0], "fs_xml_path": line[1]}
+    values = [arg for arg in line[1:] if not arg.startswith("-")]
+    batch_size = None
+    if len(values) > 1 and values[-1].isdigit():
+        batch_size = int(values.pop())
+    # Glob patterns are expanded here too, for shells that do not
+    fs_xml_paths = [
+        path for value in values for path in sorted(glob.glob(value)) or [value]
+    ]
+    args = {
+        "file": line[0],
+        "fs_xml_paths": fs_xml_paths,
+        "batch_size": batch_size,
+        "streaming": "-stream" in line,
+        "workers": MySQLDBConfig.workers if "-parallel" in line else 1,
+        "incremental": "-incremental" in line,
+        "paths": "-paths" in line,
+        "export_format": next(
+            (arg[1:] for arg in line if arg in ("-parquet", "-arrow")), None
+        ),
+    }
     return args
 
 
 if __name__ == "__main__":
     """To run the file execute the command
-    python load.py <fsimage.xml>
+    python load.py [options] <fsimage.xml>... [batch-size]
     OR
-    python3 load.py <fsimage.xml>
+    python3 load.py [options] <fsimage.xml>... [batch-size]
+
+    Several files or glob patterns are loaded concurrently, each into the cluster
+    named after the file, eg: fsimage92.xml into cluster fsimage92.
+
+    Options:
+        -stream         Parse the fsimage incrementally
+        -parallel       Insert with several writer connections
+        -incremental    Only apply the changes since the loaded snapshot
+        -parquet        Also write the tables to <fsimage-name>/<table>.parquet
+        -arrow          Also write the tables to <fsimage-name>/<table>.arrow
+        -paths          Also rebuild the path table with subtree rollups, implied by
+                        -incremental once the cluster has a path table
+
+    Eg: python load.py test-files/fsimage564.xml 5000
+        python load.py -stream -parallel fsimage.xml
+        python load.py -stream -parquet fsimage.xml
+        python load.py -stream "dumps/*.xml"
+
+    To only apply the changes since the loaded snapshot, without running create.sql
+        python load.py -incremental test-files/fsimage564.xml
     """
     if len(sys.argv) < 2:
-        print("Usage: python3 load.py <fsimage.xml>")
+        print("Usage: python3 load.py [options] <fsimage.xml>... [batch-size]")
         sys.exit(1)
 
     args = parse_args(sys.argv)
-    fs = LoadDatabase(args["fs_xml_path"])
-    fs.load()
+    if len(args["fs_xml_paths"]) > 1:
+        load_many(args["fs_xml_paths"], args)
+    else:
+        load_file(args["fs_xml_paths"][0], "", args)